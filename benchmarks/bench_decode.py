@@ -0,0 +1,96 @@
+# romero@engineer.com
+
+# Compares the bulk .msg decoder against the original byte-at-a-time loop.
+# Run from the repository root:
+#   python benchmarks/bench_decode.py [message count]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate import make_msg_data
+
+from pmxcore.records import Message, decode_messages, encoding, encoding_errors, message_chunk_bytes
+
+# NULL separator to previous message line number guide (used by the original loop):
+null_separator_pos_prev_m = {
+    54: "M1",
+    105: "M2",
+    156: "M3",
+    207: "M4",
+    258: "M5",
+    309: "M6",
+    360: "M7",
+    411: "M8"
+}
+
+# The original loop used chr(), which reads bytes 128 - 159 as control
+# characters. Look each byte up as windows-1252 instead so both decoders
+# are expected to give the same text.
+byte_chars = [bytes([integer_value]).decode(encoding, encoding_errors) for integer_value in range(256)]
+
+def legacy_decode(data):
+    messages = []
+    i = 0  # Byte counter
+    A = B = C = D = 0  # ID
+    message = Message()
+    message_line = ""
+    null_flag = False
+    for integer_value in data:
+        byte_char = byte_chars[integer_value]
+        if i == message_chunk_bytes:  # Finished with message, reset
+            A = B = C = D = i = 0
+            messages.append(message)
+            message = Message()
+            message_line = ""
+            null_flag = False
+        if i in null_separator_pos_prev_m:
+            if not null_flag and integer_value != 0:
+                message_line += byte_char
+            setattr(message, null_separator_pos_prev_m[i], message_line.replace("\x00", ""))
+            null_flag = False
+            message_line = ""
+        if not null_flag:
+            if i == 0:
+                A = integer_value
+            elif i == 1:
+                B = integer_value
+            elif i == 2:
+                C = integer_value
+            elif i == 3:
+                D = integer_value
+                message.set_id(A + (256 * B) + (256 * 256 * C) + (256 * 256 * 256 * D))
+            elif i not in null_separator_pos_prev_m:
+                if integer_value == 0:
+                    null_flag = True
+                else:
+                    message_line += byte_char
+        i += 1
+    if message.valid_message_id():
+        messages.append(message)
+    return messages
+
+def best_of(function, data, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    data = make_msg_data(count)
+
+    legacy_time, legacy_messages = best_of(legacy_decode, data)
+    bulk_time, bulk_messages = best_of(decode_messages, data)
+
+    same = [vars(m) for m in legacy_messages] == [vars(m) for m in bulk_messages]
+    print(f"Messages: {count} ({len(data)} bytes)")
+    print(f"Byte loop:    {legacy_time:.4f} s")
+    print(f"Bulk decoder: {bulk_time:.4f} s")
+    print(f"Speedup:      {legacy_time / bulk_time:.1f}x")
+    print(f"Identical output: {same}")
@@ -0,0 +1,70 @@
+# romero@engineer.com
+
+# Compares the batched .msg encoder against the original per-character writer.
+# Run from the repository root:
+#   python benchmarks/bench_encode.py [message count]
+
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pmxcore.records import Message, encoding, message_line_bytes, write_messages
+
+def write_to_file_m_format(file, message):
+    if len(message) > message_line_bytes:
+        message = message[:message_line_bytes]
+    for i in range(message_line_bytes):
+        if i < len(message):
+            file.write(message[i].encode(encoding))
+        else:
+            file.write(b'\x00')
+
+def legacy_write(file, messages):
+    for msg in messages:
+        D = msg.id // (256 ** 3)
+        C = (msg.id % (256 ** 3)) // (256 ** 2)
+        B = (msg.id % (256 ** 2)) // 256
+        A = msg.id % 256
+        file.write(bytes([A]))
+        file.write(bytes([B]))
+        file.write(bytes([C]))
+        file.write(bytes([D]))
+        for line in [msg.M1, msg.M2, msg.M3, msg.M4, msg.M5, msg.M6, msg.M7, msg.M8]:
+            write_to_file_m_format(file, line)
+            file.write(b'\x00')
+
+def make_messages(count, seed=0):
+    rng = random.Random(seed)
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZ abcdefghijklmnopqrstuvwxyz0123456789.,%$éü"
+    messages = []
+    for n in range(count):
+        lines = ["".join(rng.choice(alphabet) for _ in range(rng.choice([0, 0, 12, 30, 50, 60]))) for _ in range(8)]
+        messages.append(Message(rng.randrange(1, 4294967295), *lines))
+    return messages
+
+def time_writer(writer, messages, repeat=3):
+    best = None
+    for _ in range(repeat):
+        file = io.BytesIO()
+        start = time.perf_counter()
+        writer(file, messages)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, file.getvalue()
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    messages = make_messages(count)
+
+    legacy_time, legacy_bytes = time_writer(legacy_write, messages)
+    batch_time, batch_bytes = time_writer(write_messages, messages)
+
+    print(f"Messages: {count} ({len(batch_bytes)} bytes)")
+    print(f"Per-character writer: {legacy_time:.4f} s")
+    print(f"Batched encoder:      {batch_time:.4f} s")
+    print(f"Speedup:              {legacy_time / batch_time:.1f}x")
+    print(f"Byte-for-byte identical: {legacy_bytes == batch_bytes}")
@@ -0,0 +1,53 @@
+# romero@engineer.com
+
+# Measures how long the programs take to start, each in a fresh Python
+# process, and which of the slow-to-import libraries got loaded on the way.
+# Run from the repository root:
+#   python benchmarks/bench_startup.py [repeat count]
+#
+# pmxUI.py opens a window as soon as it is imported, so it is not timed here.
+# Its imports are the same as pmx.py's apart from tkinter.
+
+import os
+import subprocess
+import sys
+import time
+
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+heavy_modules = ("numpy", "pandas", "openpyxl", "xlsxwriter", "xlwt")
+
+# (label, code run with python -c)
+startup_cases = [
+    ("import pmxcore", "import pmxcore"),
+    ("import pmx (menu script)", "import pmx"),
+    ("pmx.py --help", "import pmx; pmx.run_cli(['--help'])"),
+    ("pmx.py dirinfo", "import pmx; pmx.run_cli(['dirinfo', '.'])"),
+]
+
+def loaded_heavy_modules(code):
+    check = (f"try:\n    exec({code!r})\nexcept SystemExit:\n    pass\n"
+             f"import sys\nprint('heavy:' + ','.join(name for name in {heavy_modules!r} if name in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", check], cwd=repository, capture_output=True, text=True).stdout
+    lines = [line for line in output.splitlines() if line.startswith("heavy:")]
+    return lines[-1][len("heavy:"):] if lines else "?"
+
+def time_startup(code, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=repository, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    baseline = time_startup("pass", repeat)
+    print(f"Python itself: {baseline:.3f} s\n")
+    for label, code in startup_cases:
+        elapsed = time_startup(code, repeat)
+        print(f"{label:28} {elapsed:.3f} s  (+{elapsed - baseline:.3f} s)  heavy imports: {loaded_heavy_modules(code) or 'none'}")
+    for name in heavy_modules:
+        elapsed = time_startup(f"import {name}", repeat)
+        print(f"{'import ' + name:28} {elapsed:.3f} s  (+{elapsed - baseline:.3f} s)")
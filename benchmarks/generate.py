@@ -0,0 +1,128 @@
+# romero@engineer.com
+
+# Synthetic LP-Works data for the benchmarks: .msg files, message
+# spreadsheets and PLU spreadsheets of any size. The same seed always gives
+# the same data. Run from the repository root to write a set of files:
+#   python benchmarks/generate.py <output directory> [message count] [PLU count]
+#
+# The messages include the cases the converters have to get right:
+#   - blank lines, short lines and full 50-character lines
+#   - leftover bytes after the NULL that ends a line
+#   - a full line followed by a non-NULL separator byte
+#   - characters 128 - 159, including the five bytes windows-1252 leaves unused
+#   - IDs that are out of order, and IDs used more than once
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pmxcore.records import message_field_bytes, message_line_bytes, record_struct
+
+ascii_bytes = bytes(range(32, 127))
+high_bytes = bytes(range(128, 256))
+c1_bytes = bytes(range(128, 160))
+
+def make_line(rng):
+    kind = rng.random()
+    if kind < 0.30:
+        return b""
+    if kind < 0.45:
+        # Full line, sometimes with a non-NULL byte in the separator slot
+        line = bytes(rng.choice(ascii_bytes) for _ in range(message_line_bytes))
+        return line + b"!" if rng.random() < 0.2 else line
+    length = rng.randrange(1, message_line_bytes)
+    alphabet = ascii_bytes * 6 + high_bytes + c1_bytes
+    line = bytes(rng.choice(alphabet) for _ in range(length))
+    if kind < 0.55:
+        # Leftover bytes from an older, longer line after the NULL
+        leftover = bytes(rng.choice(ascii_bytes) for _ in range(message_line_bytes - length - 1))
+        return line + b"\x00" + leftover
+    return line
+
+# Record IDs: mostly rising with gaps, with a share of them moved out of
+# order and a share reusing an earlier ID
+def make_ids(count, rng, duplicate_rate=0.02, shuffle_rate=0.05):
+    ids = []
+    next_id = 1
+    for _ in range(count):
+        if ids and rng.random() < duplicate_rate:
+            ids.append(rng.choice(ids))
+        else:
+            ids.append(next_id)
+            next_id += rng.choice((1, 1, 1, 2, 5))
+    for _ in range(int(count * shuffle_rate)):
+        i, j = rng.randrange(count), rng.randrange(count)
+        ids[i], ids[j] = ids[j], ids[i]
+    return ids
+
+def make_msg_data(count, seed=0, duplicate_rate=0.02, shuffle_rate=0.05):
+    rng = random.Random(seed)
+    records = []
+    for id in make_ids(count, rng, duplicate_rate, shuffle_rate):
+        records.append(record_struct.pack(id, *[make_line(rng)[:message_field_bytes] for _ in range(8)]))
+    return b"".join(records)
+
+def write_msg_file(msg_file_path, count, seed=0, duplicate_rate=0.02, shuffle_rate=0.05):
+    with open(msg_file_path, 'wb') as file:
+        file.write(make_msg_data(count, seed, duplicate_rate, shuffle_rate))
+    return msg_file_path
+
+# A message spreadsheet made the way menu option 1 makes them
+def write_message_sheet(xlsx_file_path, count, seed=0):
+    from pmxcore.convert import msg_to_xlsx
+
+    msg_file_path = os.path.splitext(xlsx_file_path)[0] + ".msg"
+    write_msg_file(msg_file_path, count, seed)
+    msg_to_xlsx(msg_file_path, xlsx_file_path, sort_output="unsorted")
+    return xlsx_file_path
+
+# A PLU spreadsheet with the columns LP-Works exports. About a third of the
+# PLUs have no message (MessageNo 0) and a few point at a message that does
+# not exist.
+def make_plu_dataframe(count, message_ids, seed=0):
+    import pandas as pd
+
+    rng = random.Random(seed)
+    message_ids = sorted(set(message_ids)) or [1]
+    rows = []
+    for plu_no in range(1, count + 1):
+        roll = rng.random()
+        if roll < 0.33:
+            message_no = 0
+        elif roll < 0.36:
+            message_no = max(message_ids) + rng.randrange(1, 1000)
+        else:
+            message_no = rng.choice(message_ids)
+        rows.append({
+            "PLU No": plu_no,
+            "Name": "Item %d %s" % (plu_no, rng.choice(("Beef", "Pork", "Chicken", "Deli", "Cheese", "Bakery"))),
+            "GCode": rng.randrange(1, 40),
+            "MessageNo": message_no,
+            "Unit Price": round(rng.uniform(0.5, 40), 2),
+            "Shelf Life": rng.choice((0, 3, 5, 7, 14)),
+        })
+    return pd.DataFrame(rows)
+
+def write_plu_sheet(xlsx_file_path, count, message_ids, seed=0):
+    make_plu_dataframe(count, message_ids, seed).to_excel(xlsx_file_path, index=False)
+    return xlsx_file_path
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python benchmarks/generate.py <output directory> [message count] [PLU count]")
+        sys.exit(2)
+    directory = sys.argv[1]
+    message_count = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    plu_count = int(sys.argv[3]) if len(sys.argv) > 3 else message_count * 2
+    os.makedirs(directory, exist_ok=True)
+
+    from pmxcore.index import scan_ids
+
+    msg_file_path = write_msg_file(os.path.join(directory, "messages.msg"), message_count)
+    write_message_sheet(os.path.join(directory, "messages.xlsx"), message_count)
+    with open(msg_file_path, 'rb') as file:
+        message_ids = scan_ids(file.read())
+    write_plu_sheet(os.path.join(directory, "plu.xlsx"), plu_count, message_ids)
+    print(f"Wrote {message_count} messages and {plu_count} PLUs to {directory}")
@@ -0,0 +1,214 @@
+# romero@engineer.com
+
+# Times every pmx task on generated data and compares runs against a saved
+# baseline. Run from the repository root:
+#   python benchmarks/suite.py run [--messages N] [--plus N] [--repeat N] [--only task ...] [--save results.json]
+#   python benchmarks/suite.py compare baseline.json results.json [--threshold 0.10]
+#
+# Each task is timed a few times on the same files and the best time is kept.
+# compare lists every task in both files and exits with 1 if any task got
+# slower than the baseline by more than the threshold (10% by default), so it
+# can stop a deployment script. Only compare results from the same machine.
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate import make_msg_data, write_plu_sheet
+
+from pmxcore.convert import xlsx_to_msg
+from pmxcore.excel import export_messages_to_excel
+from pmxcore.index import scan_ids
+from pmxcore.plu import append_messages_to_plu, sort_plu_by_gcode
+from pmxcore.records import decode_messages, message_line_names, merged_columns_batch, write_messages
+from pmxcore.workbook import xls_to_xlsx, xlsx_to_xls
+
+results_version = 1
+
+# Files and data shared by the tasks, made once per run
+class Workspace:
+    def __init__(self, directory, message_count, plu_count):
+        self.directory = directory
+        self.message_count = message_count
+        self.plu_count = plu_count
+        self.msg_data = make_msg_data(message_count)
+        self.messages = decode_messages(self.msg_data)
+        self.msg_file_path = self.path("messages.msg")
+        with open(self.msg_file_path, 'wb') as file:
+            file.write(self.msg_data)
+        self.message_sheet_path = self.path("messages.xlsx")
+        export_messages_to_excel(self.messages, self.message_sheet_path)
+        self.plu_sheet_path = write_plu_sheet(self.path("plu.xlsx"), plu_count, scan_ids(self.msg_data))
+        self.plu_xls_path = xlsx_to_xls(self.plu_sheet_path, self.path("plu.xls"))
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+def task_startup(workspace):
+    subprocess.run([sys.executable, "-c", "import pmx"], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True)
+    return 1
+
+def task_decode(workspace):
+    decode_messages(workspace.msg_data)
+    return workspace.message_count
+
+def task_encode(workspace):
+    write_messages(io.BytesIO(), workspace.messages)
+    return workspace.message_count
+
+def task_merged_columns(workspace):
+    merged_columns_batch([[getattr(message, name) for name in message_line_names] for message in workspace.messages])
+    return workspace.message_count
+
+def task_xlsx_export(workspace):
+    export_messages_to_excel(workspace.messages, workspace.path("export.xlsx"))
+    return workspace.message_count
+
+def task_xlsx_import(workspace):
+    xlsx_to_msg(workspace.message_sheet_path, workspace.path("import.msg"))
+    return workspace.message_count
+
+def task_plu_merge(workspace):
+    append_messages_to_plu(workspace.plu_sheet_path, workspace.message_sheet_path, workspace.path("plu+messages.xlsx"))
+    return workspace.plu_count
+
+def task_gsort(workspace):
+    sort_plu_by_gcode(workspace.plu_sheet_path, workspace.path("plu g-sorted.xlsx"))
+    return workspace.plu_count
+
+def task_gsort_xls(workspace):
+    sort_plu_by_gcode(workspace.plu_xls_path, workspace.path("plu g-sorted.xls"))
+    return workspace.plu_count
+
+def task_xlsx_to_xls(workspace):
+    xlsx_to_xls(workspace.plu_sheet_path, workspace.path("converted.xls"))
+    return workspace.plu_count
+
+def task_xls_to_xlsx(workspace):
+    xls_to_xlsx(workspace.plu_xls_path, workspace.path("converted.xlsx"))
+    return workspace.plu_count
+
+# task name -> function taking the Workspace and returning the number of
+# records (messages or PLUs) it handled
+benchmark_tasks = {
+    "startup": task_startup,
+    "decode": task_decode,
+    "encode": task_encode,
+    "merged_columns": task_merged_columns,
+    "xlsx_export": task_xlsx_export,
+    "xlsx_import": task_xlsx_import,
+    "plu_merge": task_plu_merge,
+    "gsort": task_gsort,
+    "gsort_xls": task_gsort_xls,
+    "xlsx_to_xls": task_xlsx_to_xls,
+    "xls_to_xlsx": task_xls_to_xlsx,
+}
+
+def time_task(task, workspace, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = task(workspace)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, records
+
+def run_suite(message_count=5000, plu_count=10000, repeat=3, only=None):
+    import warnings
+    warnings.simplefilter("ignore")
+
+    directory = tempfile.mkdtemp(prefix="pmx-bench-")
+    try:
+        workspace = Workspace(directory, message_count, plu_count)
+        results = {}
+        for name, task in benchmark_tasks.items():
+            if only and name not in only:
+                continue
+            seconds, records = time_task(task, workspace, repeat)
+            results[name] = {"seconds": seconds, "records": records, "records_per_second": records / seconds if seconds else None}
+            print(f"{name:16} {seconds:9.4f} s  {records / seconds if seconds else 0:12,.0f} records/s")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "version": results_version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "messages": message_count,
+        "plus": plu_count,
+        "repeat": repeat,
+        "results": results,
+    }
+
+def load_results(results_file_path):
+    with open(results_file_path, 'r') as file:
+        results = json.load(file)
+    if results.get("version") != results_version:
+        raise ValueError(f"{results_file_path} is not a benchmark results file from this suite")
+    return results
+
+# Returns the names of the tasks that got slower by more than threshold
+def compare_results(baseline, current, threshold=0.10):
+    if (baseline["messages"], baseline["plus"]) != (current["messages"], current["plus"]):
+        print("NOTE: The runs used different data sizes, so the times are not directly comparable.")
+    regressions = []
+    print(f"{'task':16} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, base in baseline["results"].items():
+        if name not in current["results"]:
+            print(f"{name:16} {base['seconds']:9.4f}s {'-':>10} {'missing':>8}")
+            continue
+        seconds = current["results"][name]["seconds"]
+        change = seconds / base["seconds"] - 1 if base["seconds"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  SLOWER"
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{name:16} {base['seconds']:9.4f}s {seconds:9.4f}s {change:+8.1%}{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="suite.py", description="Benchmark suite for pmx tasks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="time every task")
+    run.add_argument("--messages", type=int, default=5000, help="messages in the generated .msg file (default: 5000)")
+    run.add_argument("--plus", type=int, default=10000, help="rows in the generated PLU spreadsheet (default: 10000)")
+    run.add_argument("--repeat", type=int, default=3, help="times each task is run, keeping the best (default: 3)")
+    run.add_argument("--only", nargs="+", choices=list(benchmark_tasks), help="run only these tasks")
+    run.add_argument("--save", help="save the results as JSON to this file")
+
+    compare = commands.add_parser("compare", help="compare results against a baseline")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.10, help="slowdown that counts as a regression (default: 0.10 for 10%%)")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        results = run_suite(args.messages, args.plus, args.repeat, args.only)
+        if args.save:
+            with open(args.save, 'w') as file:
+                json.dump(results, file, indent=2)
+            print("Saved results to", args.save)
+        return 0
+
+    regressions = compare_results(load_results(args.baseline), load_results(args.current), args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} task(s) got slower: {', '.join(regressions)}")
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -26,8 +26,9 @@
 #         - For each message
 #           - Fill row with ID, M1 through M8, and merged messages
 #           - Export as same-named file .xlsx
-#         - Check if the IDs are in order
-#           - If not in order, export a sorted version
+#         - Check if the IDs are in order while the messages are decoded
+#           - If not in order, export a sorted version (as a separate file, as
+#             a second sheet, or in place of the file order)
 #           - If in order, notify that it already is sorted
 #   - If the file does not exist, notify and exit.
 
@@ -66,30 +67,25 @@
 # 158: ž                  ASCII Code: 382
 # 159: Ÿ                  ASCII Code: 376
 
-import xlsxwriter
+# Message lines are decoded and encoded as windows-1252, so the characters above
+# show up in Excel as listed. The unused ones are kept as control characters.
+
 import os
-import pandas as pd
-import openpyxl
-from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
+import sys
 import warnings
 import glob
-import xlwt
 import shlex
-
-encoding = "windows-1252"
-
-message_chunk_bytes = 412
-id_bytes = 4
-message_line_bytes = 50
-
-def empty_check(x):
-    if len(x) > 1:
-        return False
-    elif len(x) == 1 and ord(x) == 0:
-        return True
-    else:
-        return x == "" or len(x) == 0
+from pmxcore.batch import convert_directory
+from pmxcore.cli import print_merged_columns, run_cli
+from pmxcore.convert import msg_to_xlsx, read_msg, write_msg
+from pmxcore.duplicates import duplicate_report_path, resolve_duplicates, write_duplicate_report
+from pmxcore.msgops import filter_msg, merge_msg, parse_id_ranges, sort_msg, split_msg
+from pmxcore.patch import patch_msg, read_message_updates
+from pmxcore.plu import append_messages_to_plu, sort_plu_by_gcode
+from pmxcore.records import Message, id_struct
+from pmxcore.stats import TaskStats, stage
+from pmxcore.sync import sync_msg_to_xlsx, sync_xlsx_to_msg
+from pmxcore.workbook import convert_xls
 
 def list_characters_with_ascii(input_string):
     lines = []
@@ -99,596 +95,145 @@ def list_characters_with_ascii(input_string):
         lines.append(line)
     return "\n".join(lines)
 
-class Message:
-    def __init__(self, id=0, M1="", M2="", M3="", M4="", M5="", M6="", M7="", M8=""):
-        self.id = id
-        self.M1 = M1
-        self.M2 = M2
-        self.M3 = M3
-        self.M4 = M4
-        self.M5 = M5
-        self.M6 = M6
-        self.M7 = M7
-        self.M8 = M8
-        
-    def set_id(self, id):
-        self.id = id
-        
-    def set_m1(self, m1):
-        self.M1 = m1
-        
-    def set_m2(self, m2):
-        self.M2 = m2
-        
-    def set_m3(self, m3):
-        self.M3 = m3
-        
-    def set_m4(self, m4):
-        self.M4 = m4
-        
-    def set_m5(self, m5):
-        self.M5 = m5
-        
-    def set_m6(self, m6):
-        self.M6 = m6
-        
-    def set_m7(self, m7):
-        self.M7 = m7
-        
-    def set_m8(self, m8):
-        self.M8 = m8
-
-    def valid_message_id(self):
-        return self.id > 0
-    
-    def message_empty(self):
-        return self.M1 != "" | self.M2 != "" | self.M3 != "" | self.M4 != "" | self.M5 != "" | self.M6 != "" | self.M7 != "" | self.M8 != ""
-    
-    def print(self):
-        print("Message", self.id, ": M1: \"", self.M1,
-              "\"  M2: \"", self.M2,
-              "\"  M3: \"", self.M3,
-              "\"  M4: \"", self.M4,
-              "\"  M5: \"", self.M5,
-              "\"  M6: \"", self.M6, 
-              "\"  M7: \"", self.M7,
-              "\"  M8: \"", self.M8)
-    
-    def merge_ms(self, separator=""):
-        return f"{self.M1}{separator}{self.M2}{separator}{self.M3}{separator}{self.M4}{separator}{self.M5}{separator}{self.M6}{separator}{self.M7}{separator}{self.M8}"#.replace("\x00", "")
-
-    def merge_ms_optimal(self, separator=""):
-
-        merged_message_lines = self.merge_ms(separator)
-        
-        if separator == "" and len(separator) == 0:
-            return merged_message_lines.replace("\x00", "")
-
-        final_empty_flag = False
-        
-        # Remove any hanging blank lines
-        if empty_check(self.M8):
-            merged_message_lines = merged_message_lines[:-(len(separator) + len(self.M8))]
-        else:
-            final_empty_flag = True
-        if empty_check(self.M7) and not final_empty_flag:
-            merged_message_lines = merged_message_lines[:-(len(separator) + len(self.M7))]
-        else:
-            final_empty_flag = True
-        if empty_check(self.M6) and not final_empty_flag:
-            merged_message_lines = merged_message_lines[:-(len(separator) + len(self.M6))]
-        else:
-            final_empty_flag = True
-        if empty_check(self.M5) and not final_empty_flag:
-            merged_message_lines = merged_message_lines[:-(len(separator) + len(self.M5))]
-        else:
-            final_empty_flag = True
-        if empty_check(self.M4) and not final_empty_flag:
-            merged_message_lines = merged_message_lines[:-(len(separator) + len(self.M4))]
-        else:
-            final_empty_flag = True 
-        if empty_check(self.M3) and not final_empty_flag:
-            merged_message_lines = merged_message_lines[:-(len(separator) + len(self.M3))]
-        else:
-            final_empty_flag = True 
-        if empty_check(self.M2) and not final_empty_flag:
-            merged_message_lines = merged_message_lines[:-(len(separator) + len(self.M2))]
-        else:
-            final_empty_flag = True 
-        if empty_check(self.M1) and not final_empty_flag:
-            merged_message_lines = merged_message_lines[:-(len(separator) + len(self.M1))]
-        else:
-            final_empty_flag = True
-        
-        return merged_message_lines.replace("\x00", "")
-            
-def get_id_from_bytes(A, B, C, D):
-    return ord(A) + (256 * ord(B)) + (256 * 256 * ord(C)) + (256 * 256 * 256 * ord(D))
-
-def get_id_from_ints(A, B, C, D):
-    return A + (256 * B) + (256 * 256 * C) + (256 * 256 * 256 * D)
-
-def write_to_file_m_format(file, message):
-    if len(message) > message_line_bytes:
-        message = message[:message_line_bytes]
-    for i in range(message_line_bytes):
-        if i < len(message):
-            file.write(message[i].encode(encoding))
-        else:
-            file.write(b'\x00')
-
-# NULL separator to previous message line number guide:
-null_separator_pos_prev_m = {
-    54: "M1",
-    105: "M2",
-    156: "M3",
-    207: "M4",
-    258: "M5",
-    309: "M6",
-    360: "M7",
-    411: "M8"
-}
-
 def is_word_in_input(word, text):
     normalized_word = word.lower().replace(" ", "")
     normalized_text = text.lower().replace(" ", "")
     return normalized_word in normalized_text
 
-print("PLU/MSG/Excel Python program started: \n")
-
-debug_mode = False
-
-# original_sf_warning_settings = warnings.simplefilter('default')
-# original_fw_warning_settings = warnings.filterwarnings('default')
-# original_warning_settings = warnings.filters[:]
-
-while True:
-
-    print("Select a task:")
-    print("1.) Convert .msg file to Excel file")
-    print("2.) Convert Excel file to .msg file")
-    print("3.) Append message Excel file to PLU Excel file")
-    print("4.) Sort PLU Excel by g-code")
-    print("5.) Convert .xls to .xlsx (Old Excel to New Excel)")
-    print("6.) Convert .xlsx to .xls (New Excel to Old Excel)")
-    print("7.) Toggle Debug Mode (Currently set to " + str(debug_mode) + ")")
-    print("8.) Get or change directory info")
-    print("9.) Help")
-    print("0.) Exit program\n")
-
-    user_input = str(input("Type a number and press \'enter\' to select an option: "))
-    print("")
-
-    if user_input == '1':
-
-        alt_merge_mode = False
-        proceed = True
-        print("Select a merged message column style:")
-        print("1.) Standard string appending: Identical to having typed the merged strings out. (Compatible with the other tools)")
-        print("2.) Formula string appending:  Merges strings together using formulas. (Dynamic, but incompatible with the other tools)")
-        print("Enter anything else to cancel this action.\n")
-
-        user_mm_input = input("Type a number and press \'enter\' to select an option: ")
+def main():
+    print("PLU/MSG/Excel Python program started: \n")
+
+    debug_mode = False
+
+    # original_sf_warning_settings = warnings.simplefilter('default')
+    # original_fw_warning_settings = warnings.filterwarnings('default')
+    # original_warning_settings = warnings.filters[:]
+
+    while True:
+
+        print("Select a task:")
+        print("1.) Convert .msg file to Excel file")
+        print("2.) Convert Excel file to .msg file")
+        print("3.) Append message Excel file to PLU Excel file")
+        print("4.) Sort PLU Excel by g-code")
+        print("5.) Convert .xls to .xlsx (Old Excel to New Excel)")
+        print("6.) Convert .xlsx to .xls (New Excel to Old Excel)")
+        print("7.) Toggle Debug Mode (Currently set to " + str(debug_mode) + ")")
+        print("8.) Get or change directory info")
+        print("9.) Help")
+        print("10.) Patch .msg file with changed messages (Excel or CSV file)")
+        print("11.) Sync changes between a .msg file and its Excel file")
+        print("12.) Convert every .msg or Excel file in a directory (batch)")
+        print("13.) Sort .msg file by message ID")
+        print("14.) Merge, filter or split .msg files by message ID")
+        print("0.) Exit program\n")
+
+        user_input = str(input("Type a number and press \'enter\' to select an option: "))
         print("")
-        if user_mm_input == '1':
-            # alt_merge_mode = False
-            pass
-        elif user_mm_input == '2':
-            alt_merge_mode = True
-            # print("NOTE: This Excel file will be saved as a .xlsx file. The old .xls file type does not support these formulas.\n")
-        else:
-            proceed = False
-            print("Cancelling task...\n")
 
-        if proceed:
-            msg_file_path = str(input("Enter the name of the msg file: "))
-            msg_name, msg_extension = os.path.splitext(msg_file_path)
-            msg_file_name_without_extension = os.path.basename(msg_name)
-            try:
-                with open(msg_file_path, 'rb') as file:
-                
-                    messages = []
-                    i = 0 # Byte counter
-                    A = B = C = D = 0 # ID
-                    message = Message()
-                    message_line = ""
-                    null_flag = False
-                    null_separator = False
-                    while True:
-                        byte = file.read(1)
-                        if not byte:
-                            if message.valid_message_id():  # If there's a valid message when EOF is hit
-                                messages.append(message)
-                            break  # End of file
-                        
-                        integer_value = ord(byte)
-                        byte_char = chr(integer_value)
-                        # Position logic
-                        if i == message_chunk_bytes: # Finished with message, reset
-                            A = B = C = D = i = 0
-                            messages.append(message)
-                            message = Message()
-                            message_line = ""
-                            null_flag = False
-                        # NULL separator positions: 54, 105, 156, 207, 258, 309, 360, 411
-                        if i in null_separator_pos_prev_m:
-                            if (not null_flag & integer_value != 0):
-                                message_line += byte_char
-                            setattr(message, null_separator_pos_prev_m[i], message_line.replace("\x00", ""))
-                            null_flag = False
-                            message_line = ""
-                        if not null_flag:
-                            if i == 0:
-                                A = integer_value
-                            elif i == 1:
-                                B = integer_value
-                            elif i == 2:
-                                C = integer_value
-                            elif i == 3:
-                                D = integer_value
-                                message.set_id(get_id_from_ints(A, B, C, D))
-                            elif i not in null_separator_pos_prev_m: 
-                                if integer_value == 0:
-                                    null_flag = True
-                                else:
-                                    message_line += byte_char
-                        i += 1
-            except FileNotFoundError:
-              print("Error:", msg_file_path, "not found. Make sure path is correct, file is in the correct directory, or file exists.\n")
-              proceed = False
+        if user_input == '1':
+
+            alt_merge_mode = False
+            proceed = True
+            print("Select a merged message column style:")
+            print("1.) Standard string appending: Identical to having typed the merged strings out. (Compatible with the other tools)")
+            print("2.) Formula string appending:  Merges strings together using formulas. (Dynamic, but incompatible with the other tools)")
+            print("Enter anything else to cancel this action.\n")
+
+            user_mm_input = input("Type a number and press \'enter\' to select an option: ")
+            print("")
+            if user_mm_input == '1':
+                # alt_merge_mode = False
+                pass
+            elif user_mm_input == '2':
+                alt_merge_mode = True
+                # print("NOTE: This Excel file will be saved as a .xlsx file. The old .xls file type does not support these formulas.\n")
+            else:
+                proceed = False
+                print("Cancelling task...\n")
 
+            sort_output = "separate"
             if proceed:
-                if debug_mode:
-                    for msgs in messages:
-                        Message.print(msgs)
-                        print(msgs.id, Message.merge_ms(msgs, "\n"))
-                        print(msgs.id, Message.merge_ms_optimal(msgs, "\n"))
-
-                def export_messages_to_excel(messages, file_path):
-                
-                    workbook = xlsxwriter.Workbook(file_path)
-                    worksheet = workbook.add_worksheet()
-                    text_wrap_format = workbook.add_format({'text_wrap': True})
-                    header = ["ID", "M1", "M2", "M3", "M4", "M5", "M6", "M7", "M8", "Merged", "Merged with Spaces", "Merged with Newlines"]
-                    for col, label in enumerate(header):
-                        worksheet.write(0, col, label)
-
-                    if alt_merge_mode:
-                        for row, message in enumerate(messages):
-                            worksheet.write(row + 1, 0, message.id)
-                            for col, value in enumerate([message.M1, message.M2, message.M3, message.M4, message.M5, message.M6, message.M7, message.M8]):
-                                worksheet.write(row + 1, col + 1, value, text_wrap_format)
-                                # Merged in column J (Alternative methods)
-                                formula_j = '=B{row_num} & C{row_num} & D{row_num} & E{row_num} & F{row_num} & G{row_num} & H{row_num} & I{row_num}'.format(row_num=row + 2)
-                                #formula_j = '=CONCAT(B{row_num},C{row_num},D{row_num},E{row_num},F{row_num},G{row_num},H{row_num},I{row_num})'.format(row_num=row + 2)
-                                worksheet.write_formula(row + 1, 9, formula_j, text_wrap_format)
-                                #worksheet.write(row + 1, 9, formula_j, text_wrap_format)
-                                #worksheet.write(row + 1, 9, Message.merge_ms_optimal(message), text_wrap_format)
-
-                                # Merged with Spaces in column K (Alternative methods)
-                                formula_k = '=B{row_num} & " " & C{row_num} & " " & D{row_num} & " " & E{row_num} & " " & F{row_num} & " " & G{row_num} & " " & H{row_num} & " " & I{row_num}'.format(row_num=row + 2)
-                                #formula_k = '=CONCAT(B{row_num}," ",C{row_num}," ",D{row_num}," ",E{row_num}," ",F{row_num}," ",G{row_num}," ",H{row_num}," ",I{row_num})'.format(row_num=row + 2)
-                                worksheet.write_formula(row + 1, 10, formula_k, text_wrap_format)
-                                #worksheet.write(row + 1, 10, formula_k, text_wrap_format)
-                                #worksheet.write(row + 1, 10, Message.merge_ms_optimal(message, " "), text_wrap_format)
-
-                                # Merged with Newlines in column L (Alternative methods)
-                                formula_l = '=B{row_num} & CHAR(10) & C{row_num} & CHAR(10) & D{row_num} & CHAR(10) & E{row_num} & CHAR(10) & F{row_num} & CHAR(10) & G{row_num} & CHAR(10) & H{row_num} & CHAR(10) & I{row_num}'.format(row_num=row + 2)
-                                #formula_l = '=CONCAT(B{row_num},CHAR(10),C{row_num},CHAR(10),D{row_num},CHAR(10),E{row_num},CHAR(10),F{row_num},CHAR(10),G{row_num},CHAR(10),H{row_num},CHAR(10),I{row_num})'.format(row_num=row + 2)
-                                worksheet.write_formula(row + 1, 11, formula_l, text_wrap_format)
-                                #worksheet.write(row + 1, 11, formula_l, text_wrap_format)
-                                #worksheet.write(row + 1, 11, Message.merge_ms_optimal(message, "\n"), text_wrap_format)
-                    else:
-                        for row, message in enumerate(messages):
-                            worksheet.write(row + 1, 0, message.id)
-                            for col, value in enumerate([message.M1, message.M2, message.M3, message.M4, message.M5, message.M6, message.M7, message.M8, Message.merge_ms_optimal(message, ""), Message.merge_ms_optimal(message, " "), Message.merge_ms_optimal(message, "\n")]):
-                                if debug_mode:
-                                    print("Merged:", Message.merge_ms_optimal(message, ""))
-                                    print("Merged w/ space:", Message.merge_ms_optimal(message, " "))
-                                    #print("Merged w/ newline:", Message.merge_ms_optimal(message, "\n"))
-                                worksheet.write(row + 1, col + 1, value, text_wrap_format)
-                    workbook.close()
-                
-                if os.path.exists(msg_file_name_without_extension + ".xlsx"):
-                    user_ow_input = input(f"The file \'{msg_file_name_without_extension + ".xlsx"}\' already exists. Do you want to overwrite it? (y/n): ").lower()
-                    if user_ow_input == 'y' or user_ow_input == "yes":
-                        try:
-                            os.remove(msg_file_name_without_extension + ".xlsx")
-                            print(f"Overwriting {msg_file_name_without_extension + ".xlsx"} ...")
-                        except FileNotFoundError:
-                            print(f"Error: File {msg_file_name_without_extension + ".xlsx"} not found.")
-                        except PermissionError:
-                            print(f"Error: Permission denied to delete file {msg_file_name_without_extension + ".xlsx"}.")
-                        except Exception as e:
-                            print(f"Error: An unknown error occurred. Exception: {e}")
-                    elif user_ow_input == 'n' or user_ow_input == "no":
-                        print("Overwriting canceled.")
-                        proceed = False
-                    else:
-                        print("Unknown input. Overwriting canceled. The existing file was not overwritten.")
-                        proceed = False
+                print("Select how to save the messages if their IDs are out of order:")
+                print("1.) In file order, with a sorted copy in a separate file")
+                print("2.) In file order and sorted by ID, as two sheets of one file")
+                print("3.) Sorted by ID only")
+                print("4.) In file order only")
+                print("Enter anything else to cancel this action.\n")
+
+                user_so_input = input("Type a number and press \'enter\' to select an option: ")
+                print("")
+                sort_outputs_by_input = {'1': "separate", '2': "both", '3': "sorted", '4': "unsorted"}
+                if user_so_input in sort_outputs_by_input:
+                    sort_output = sort_outputs_by_input[user_so_input]
                 else:
-                    print("Exporting to", (msg_file_name_without_extension + ".xlsx"))
-                    export_messages_to_excel(messages, (msg_file_name_without_extension + ".xlsx"))
-
-                if proceed:
-                    is_sorted = True
-                    prev_id = 0
-                    for msg_ids in messages:
-                        if (msg_ids.id > prev_id):
-                            prev_id = msg_ids.id
-                        else:
-                            is_sorted = False
-                            break    
-                    if (is_sorted):
-                        print("(This file is already sorted by ID\n)")
-                    else:
-                        sorted_messages = sorted(messages, key=lambda message: message.id)
-                        print("Exporting sorted version to", (msg_file_name_without_extension + " sorted.xlsx\n"))
-                        export_messages_to_excel(sorted_messages, (msg_file_name_without_extension + " sorted.xlsx") )
-                    print("NOTE: To properly display the merged-text results, select the columns and use the \"Wrap Text\" option.")
-                    print("      You may need to change the vertical Align settings (use top or middle) as well if using formulas.\n")
-
-    if user_input == '2':
-        print("NOTE: This program is set up to take Excel spreadsheets formatted like so:")
-        print("  A      B      C      D      E      F      G      H      I")
-        print("[ ID ] [ M1 ] [ M2 ] [ M3 ] [ M4 ] [ M5 ] [ M6 ] [ M7 ] [ M8 ]\n")
-
-        proceed = True
-
-        if debug_mode:
-            # Unsuppress DeprecationWarning
-            warnings.simplefilter('default')
-            warnings.filterwarnings('default')
-        else:
-            # Suppress DeprecationWarning
-            with warnings.catch_warnings():
-                warnings.simplefilter(action='ignore', category=DeprecationWarning)
-            warnings.filterwarnings("ignore", category=DeprecationWarning)
-
-        excel_file_path = str(input("Enter the name of the Excel file: "))
-        excel_name, excel_extension = os.path.splitext(excel_file_path)
-        excel_file_name_without_extension = os.path.basename(excel_name)
-
-        new_file_path = excel_file_name_without_extension + ".msg"
-        if os.path.exists(new_file_path):
-            user_ow_input = input(f"The file \'{new_file_path}\' already exists. Do you want to overwrite it? (y/n): ").lower()
-            if user_ow_input == 'y' or user_ow_input == "yes":
-                try:
-                    os.remove(new_file_path)
-                    print(f"Overwriting {new_file_path} ...")
-                except FileNotFoundError:
-                    print(f"Error: File {new_file_path} not found.")
-                except PermissionError:
-                    print(f"Error: Permission denied to delete file {new_file_path}.")
-                    proceed = False
-                except Exception as e:
-                    print(f"Error: An unknown error occurred. Exception: {e}")
                     proceed = False
-            elif user_ow_input == 'n' or user_ow_input == "no":
-                print("Overwriting canceled.")
-                proceed = False
-            else:
-                print("Unknown input. Operation and overwriting canceled. The existing file was not overwritten.")
-                proceed = False
-        
-        if proceed:
-            try:
-                df = pd.read_excel(excel_file_path)
-
-                # Drop rows with missing ID (this would cause issues for the .msg file)
-                df = df.dropna(subset=['ID'])
-                rows = 0
-                messages = []
-                i = 0 # Byte counter
-                e_message = Message()
-                message_line = ""
-                ids = []
-
-                for index, row in df.iterrows():
-                    e_message_id = int(row['ID'])
-                    e_ms = [str(row[f'M{i}']) if pd.notna(row[f'M{i}']) else '' for i in range(1, 9)]
-                    if len(e_ms) > message_line_bytes: # Message lines cannot exceed 50 characters
-                        e_ms = e_ms[:message_line_bytes]
-                    ids.append(e_message_id)
-                    messages.append(Message(e_message_id, *e_ms))
-                    if debug_mode:
-                        print(f"[{rows}] Message ID: {e_message_id}")
-                        print(f"[{rows}] Messages 1-8: {e_ms}")
-
-                used_ids = []
-                repeat_ids = []
-
-                if len(messages) > 0:
-                    with open(new_file_path, 'wb') as file:
-                        for msg in messages:
-                            A = B = C = D = 0 # ID
-                            if debug_mode:
-                                print(f"Message Info: [{msg.id}] \"{msg.M1}\" \"{msg.M2}\" \"{msg.M3}\" \"{msg.M4}\" \"{msg.M5}\" \"{msg.M6}\" \"{msg.M7}\" \"{msg.M8}\"")
-                                print(f"Lengths: M1:{len(msg.M1)}  M2:{len(msg.M2)}  M3:{len(msg.M3)}  M4:{len(msg.M4)}  M5:{len(msg.M5)}  M6:{len(msg.M6)}  M7:{len(msg.M7)}  M8:{len(msg.M8)}")
-                            if(msg.id not in used_ids):
-                                if msg.id > 4294967295:
-                                    msg.id = 4294967295
-                                elif msg.id < 1:
-                                    msg.id = 1
-                                D = msg.id // (256 ** 3)
-                                C = (msg.id % (256 ** 3)) // (256 ** 2)
-                                B = (msg.id % (256 ** 2)) // 256
-                                A = msg.id % 256
-                                if debug_mode:
-                                    print(f"Message ID Base-10 to Base-256: {D} | {C} | {B} | {A}\n")
-                                #412: 4 50 1 50 1 50 1 50 1 50 1 50 1 50 1 50 1
-                                file.write(bytes([A]))                     # 1    |     1
-                                file.write(bytes([B]))                     # 1    |     2
-                                file.write(bytes([C]))                     # 1    |     3
-                                file.write(bytes([D]))                     # 1    |     4
-                                write_to_file_m_format(file, msg.M1)       # 50   |    54
-                                file.write(b'\x00')                        # 1    |    55
-                                write_to_file_m_format(file, msg.M2)       # 50   |   105
-                                file.write(b'\x00')                        # 1    |   106
-                                write_to_file_m_format(file, msg.M3)       # 50   |   156
-                                file.write(b'\x00')                        # 1    |   157
-                                write_to_file_m_format(file, msg.M4)       # 50   |   207
-                                file.write(b'\x00')                        # 1    |   208
-                                write_to_file_m_format(file, msg.M5)       # 50   |   258
-                                file.write(b'\x00')                        # 1    |   259
-                                write_to_file_m_format(file, msg.M6)       # 50   |   309
-                                file.write(b'\x00')                        # 1    |   310
-                                write_to_file_m_format(file, msg.M7)       # 50   |   360
-                                file.write(b'\x00')                        # 1    |   361
-                                write_to_file_m_format(file, msg.M8)       # 50   |   411
-                                file.write(b'\x00')                        # 1    |   412
-
-                                used_ids.append(msg.id)
-                            else:
-                                repeat_ids.append(msg.id)
-
-                if (debug_mode):
-                    print(f"Total: {len(ids)} Used: {len(used_ids)} Repeat: {len(repeat_ids)}\n")                
-                if len(used_ids) < len(ids) or repeat_ids > 0:
-                    if len(ids) - len(used_ids) == 1 or repeat_ids == 1:
-                        print(f"!!! ALERT: 1 message had a reused ID and is not included in this PLU message file.")
-                    else:
-                        print(f"!!! ALERT: {len(repeat_ids)} messages had reused IDs and are not included in this PLU message file.")
-                    print("*** Verify that each message has a unique non-zero ID in the spreadsheet. This may just be a duplicate entry glitch.")
-                    print("Repeat ID(s):", repeat_ids, "\n")
-
-                print("Saved to " + excel_file_name_without_extension + ".msg\n")
-            except FileNotFoundError:
-                  print("Error:", excel_file_path, "not found. Make sure path is correct, file is in the correct directory, or file exists.\n")
-                  proceed = False
-
-    if user_input == '3':
-        proceed = True
-        if debug_mode:
-            # Unsuppress FutureWarnings
-            warnings.simplefilter('default')
-        else:
-            # Suppress FutureWarnings
-            with warnings.catch_warnings():
-                warnings.simplefilter(action='ignore', category=FutureWarning)
-        
-        print("NOTE: This merging action does NOT support merging formulas.")
-        print("Merged-message cells using formulas will say \'0\' instead, but all message lines (M1 - M8) will remain intact.\n")
-
-        plu_file_path = str(input("Enter the PLU (.xlsx) file to add the messages to: "))
-        plu_name, plu_extension = os.path.splitext(plu_file_path)
-        plu_file_name_without_extension = os.path.basename(plu_name)
-        print("")
-        msg_file_path = str(input("Enter the msg (.xlsx) file be added: "))
-        msg_name, msg_extension = os.path.splitext(msg_file_path)
-        msg_file_name_without_extension = os.path.basename(msg_name)
-        print("")
-
-        def merge_files(plu_file, msg_file):
-            try:
-                # Create a dictionary to map IDs to corresponding message data
-                id_to_message = {row['ID']: row[1:] for _, row in msg_file.iterrows()}
-
-                msg_headers = ["M1", "M2", "M3", "M4", "M5", "M6", "M7", "M8", "Merged", "Merged with Spaces", "Merged with Newlines"]
-                plu_file = plu_file.reindex(columns=[*plu_file.columns, *msg_headers])
-
-                # Iterate through plu_file and update the new columns based on MessageNo
-                for index, row in plu_file.iterrows():
-                    message_no = row['MessageNo']
-                    if message_no > 0 and message_no in id_to_message:
-                        message_data = id_to_message[message_no]
-                        for i, data in enumerate(message_data):
-                            if str(data) != "nan":
-                                #plu_file.at[index, msg_headers[i]] = str(data)
-                                # Convert the column to 'object' type
-                                plu_file[msg_headers[i]] = plu_file[msg_headers[i]].astype(object)
-                                # Update the DataFrame
-                                plu_file.at[index, msg_headers[i]] = str(data)
-
-                # In an older version, for some reason the regular "Merged" column doesn't work without doing this
-                #plu_file['Merged'] = plu_file.apply(lambda row: ''.join(str(value) if not pd.isna(value) else '' for value in row['M1':'M8']), axis=1)
-
-                # Enabling Text wrapping for the merged lines
-                #for column in ['R', 'S', 'T']:
-                #    for cell in worksheet[column]:
-                #        cell.alignment = openpyxl.styles.Alignment(wrapText=True)
-
-                return plu_file
+                    print("Cancelling task...\n")
 
-            except FileNotFoundError:
-                print("Error:", plu_file_path, "or", msg_file_path, "not found. Make sure path is correct, file is in the correct directory, or file exists.")
-                proceed = False
-
-        if proceed:
-            try:
-                # Load the first Excel file (plu_file_path)
-                plu_file = pd.read_excel(plu_file_path)
-
-                # Load the second Excel file (msg_file_path)
-                msg_file = pd.read_excel(msg_file_path)
+            if proceed:
+                msg_file_path = str(input("Enter the name of the msg file: "))
+                msg_name, msg_extension = os.path.splitext(msg_file_path)
+                msg_file_name_without_extension = os.path.basename(msg_name)
+                if not os.path.exists(msg_file_path):
+                    print("Error:", msg_file_path, "not found. Make sure path is correct, file is in the correct directory, or file exists.\n")
+                    proceed = False
 
-            except FileNotFoundError:
-                print("Error:", plu_file_path, "or", msg_file_path, "not found. Make sure path is correct, file is in the correct directory, or file exists.")
-                proceed = False
+                if proceed:
+                    if debug_mode:
+                        for msgs in read_msg(msg_file_path):
+                            Message.print(msgs)
+                            print(msgs.id, Message.merge_ms(msgs, "\n"))
+                            print(msgs.id, Message.merge_ms_optimal(msgs, "\n"))
+
+                    if os.path.exists(msg_file_name_without_extension + ".xlsx"):
+                        user_ow_input = input(f"The file \'{msg_file_name_without_extension + '.xlsx'}\' already exists. Do you want to overwrite it? (y/n): ").lower()
+                        if user_ow_input == 'y' or user_ow_input == "yes":
+                            try:
+                                os.remove(msg_file_name_without_extension + ".xlsx")
+                                print(f"Overwriting {msg_file_name_without_extension + '.xlsx'} ...")
+                            except FileNotFoundError:
+                                print(f"Error: File {msg_file_name_without_extension + '.xlsx'} not found.")
+                            except PermissionError:
+                                print(f"Error: Permission denied to delete file {msg_file_name_without_extension + '.xlsx'}.")
+                            except Exception as e:
+                                print(f"Error: An unknown error occurred. Exception: {e}")
+                        elif user_ow_input == 'n' or user_ow_input == "no":
+                            print("Overwriting canceled.")
+                            proceed = False
+                        else:
+                            print("Unknown input. Overwriting canceled. The existing file was not overwritten.")
+                            proceed = False
+
+                    if proceed:
+                        print("Exporting to", (msg_file_name_without_extension + ".xlsx"))
+                        stats = TaskStats("msg to xlsx") if debug_mode else None
+                        export = msg_to_xlsx(msg_file_path, (msg_file_name_without_extension + ".xlsx"), alt_merge_mode, sort_output, print_merged_columns if debug_mode else None, stats)
+                        if export.is_sorted:
+                            print("(This file is already sorted by ID)\n")
+                        elif sort_output == "separate":
+                            print("Exported sorted version to", export.written[1], "\n")
+                        elif sort_output == "both":
+                            print("The IDs were out of order. The messages sorted by ID are on the second sheet.\n")
+                        elif sort_output == "sorted":
+                            print("The IDs were out of order. The messages were saved sorted by ID.\n")
+                        else:
+                            print("(The IDs are out of order)\n")
+                        if export.duplicate_ids:
+                            print("!!! ALERT: These IDs are used by more than one message:", export.duplicate_ids, "\n")
+                        if stats:
+                            print(stats.summary(), "\n")
+                        print("NOTE: To properly display the merged-text results, select the columns and use the \"Wrap Text\" option.")
+                        print("      You may need to change the vertical Align settings (use top or middle) as well if using formulas.\n")
 
-        if proceed:
-            merged_file = merge_files(plu_file, msg_file)
+        if user_input == '2':
+            print("NOTE: This program is set up to take Excel spreadsheets formatted like so:")
+            print("  A      B      C      D      E      F      G      H      I")
+            print("[ ID ] [ M1 ] [ M2 ] [ M3 ] [ M4 ] [ M5 ] [ M6 ] [ M7 ] [ M8 ]\n")
 
-            new_file_path = plu_file_name_without_extension + '+' + msg_file_name_without_extension + '.xlsx'
+            proceed = True
 
-            if os.path.exists(new_file_path):
-                user_ow_input = input(f"The file \'{new_file_path}\' already exists. Do you want to overwrite it? (y/n): ").lower()
-                if user_ow_input == 'y' or user_ow_input == "yes":
-                    try:
-                        os.remove(new_file_path)
-                        print(f"Overwriting {new_file_path} ...")
-                    except FileNotFoundError:
-                        print(f"Error: File {new_file_path} not found.")
-                    except PermissionError:
-                        print(f"Error: Permission denied to delete file {new_file_path}.")
-                        proceed = False
-                    except Exception as e:
-                        print(f"Error: An unknown error occurred. Exception: {e}")
-                        proceed = False
-                elif user_ow_input == 'n' or user_ow_input == "no":
-                    print("Overwriting canceled.")
-                    proceed = False
-                else:
-                    print("Unknown input. Operation and overwriting canceled. The existing file was not overwritten.")
-                    proceed = False
-
-        if proceed:    
-            try:
-                merged_file.to_excel(new_file_path, index=False)
-            except PermissionError:
-                print("Permission Error: Close", new_file_path, "if open.")
-                proceed = False
-
-        if proceed:
-            workbook = openpyxl.load_workbook(new_file_path)
-            worksheet = workbook['Sheet1']
-            header_row = worksheet[1]
-            header_to_column = {cell.value: cell.column for cell in header_row}
-            columns_to_wrap = ["Merged", "Merged with Spaces", "Merged with Newlines"]
-            for header_name in columns_to_wrap:
-                column_index = header_to_column.get(header_name)
-                if column_index:
-                    for cell in worksheet[column_index]:
-                        cell.alignment = openpyxl.styles.Alignment(wrapText=True)
-            workbook.save(new_file_path)
-            print(f"Merged and saved to {new_file_path}.\n")
-
-
-    if user_input == '4':
-        proceed = True
-        plu_file_path = str(input("Enter the PLU file (.xls or .xlsx) to be GCode-sorted: "))
-        print("")
-        if plu_file_path.endswith(".xlsx") or plu_file_path.endswith(".xls"):
-            plu_name, plu_extension = os.path.splitext(plu_file_path)
-            plu_file_name_without_extension = os.path.basename(plu_name)
-        else:
-            print("Error: File type must be an Excel spreadsheet. (.xls or .xlsx)")
-        try:
             if debug_mode:
                 # Unsuppress DeprecationWarning
-                # warnings.simplefilter(**original_sf_warning_settings)
-                # warnings.filterwarnings(**original_fw_warning_settings)
                 warnings.simplefilter('default')
                 warnings.filterwarnings('default')
             else:
@@ -697,7 +242,11 @@ while True:
                     warnings.simplefilter(action='ignore', category=DeprecationWarning)
                 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-            new_file_path = plu_file_name_without_extension + " g-sorted" + plu_extension
+            excel_file_path = str(input("Enter the name of the Excel file: "))
+            excel_name, excel_extension = os.path.splitext(excel_file_path)
+            excel_file_name_without_extension = os.path.basename(excel_name)
+
+            new_file_path = excel_file_name_without_extension + ".msg"
             if os.path.exists(new_file_path):
                 user_ow_input = input(f"The file \'{new_file_path}\' already exists. Do you want to overwrite it? (y/n): ").lower()
                 if user_ow_input == 'y' or user_ow_input == "yes":
@@ -718,201 +267,583 @@ while True:
                 else:
                     print("Unknown input. Operation and overwriting canceled. The existing file was not overwritten.")
                     proceed = False
-            
+
             if proceed:
-                df = pd.read_excel(plu_file_path)
-                sorted_df = df.sort_values(by=["GCode", df.columns[0]])
-                workbook = openpyxl.Workbook()
-                sheet = workbook.active
-                for r_idx, row in enumerate(dataframe_to_rows(sorted_df, index=False, header=True), 1):
-                    for c_idx, value in enumerate(row, 1):
-                        cell = sheet.cell(row=r_idx, column=c_idx, value=value)
-                print("Sorted successfully. Saving to " + (plu_file_name_without_extension + " g-sorted" + plu_extension) + "\n")
-                
-                workbook.save(plu_file_name_without_extension + " g-sorted" + plu_extension)
-                if plu_extension == ".xls":
-                    print("NOTE: This program works better with the newer .xlsx Excel file format. The older .xls format can work with this, but the created file may give a warning about data being corrupted or unsafe.\n")
-        except FileNotFoundError:
-            print("Error:", (plu_file_path), "not found or incompatible. Make sure path is correct, file type is correct, file is in the correct directory, or file exists.\n")
-
-    if user_input == '5': # OLD -> NEW
-        print("NOTE: This does NOT delete or overwrite the original Excel file. This command makes a copy of the file with a different file extension.\n")
-        xls_file_path = input("Enter the name of the .xls file to be converted: ")
-        print("")
-        xls_file_path = xls_file_path.replace(".xls", "")
-        if os.path.exists(xls_file_path + ".xls"):
-            xlsx_file_path = xls_file_path + '.xlsx'
-            df = pd.read_excel(xls_file_path + ".xls", sheet_name=None)
-            with pd.ExcelWriter(xlsx_file_path, engine='xlsxwriter') as writer:
-                for sheet_name, data in df.items():
-                    data.to_excel(writer, sheet_name=sheet_name, index=False)
-
-            print("Converted and saved to "+ xlsx_file_path+ "\n")
-        else:
-            print("Error: File \'" + xls_file_path + ".xls\' does not exist or couldn't be found.\n")
+                try:
+                    stats = TaskStats("xlsx to msg") if debug_mode else None
+                    with stage(stats, "read") as read:
+                        messages = read_message_updates(excel_file_path)
+                        read.records = len(messages)
 
-    if user_input == '6': # NEW -> OLD
-        print("NOTE: This does NOT delete or overwrite the original Excel file. This command makes a copy of the file with a different file extension.")
-        print("ALSO NOTE: As .xls is an older format, many formulas do NOT work when converted from .xlsx to .xls.\n")
-        xlsx_file_path = input("Enter the name of the .xlsx file: ")
-        print("")
-        xlsx_file_path = xlsx_file_path.replace(".xlsx", "")
-        if os.path.exists(xlsx_file_path + ".xlsx"):
+                    if debug_mode:
+                        for msg in messages:
+                            print(f"Message Info: [{msg.id}] \"{msg.M1}\" \"{msg.M2}\" \"{msg.M3}\" \"{msg.M4}\" \"{msg.M5}\" \"{msg.M6}\" \"{msg.M7}\" \"{msg.M8}\"")
+                            print(f"Lengths: M1:{len(msg.M1)}  M2:{len(msg.M2)}  M3:{len(msg.M3)}  M4:{len(msg.M4)}  M5:{len(msg.M5)}  M6:{len(msg.M6)}  M7:{len(msg.M7)}  M8:{len(msg.M8)}")
+
+                    duplicate_policy = "first"
+                    unique_messages, repeated_messages = resolve_duplicates(messages, duplicate_policy)
+                    if repeated_messages:
+                        repeat_ids = sorted({msg.id for msg in repeated_messages})
+                        if len(repeated_messages) == 1:
+                            print(f"!!! ALERT: 1 message had a reused ID. Only one message per ID can be saved to a PLU message file.")
+                        else:
+                            print(f"!!! ALERT: {len(repeated_messages)} messages had reused IDs. Only one message per ID can be saved to a PLU message file.")
+                        print("Repeat ID(s):", repeat_ids, "\n")
+                        print("Select how to handle the reused IDs:")
+                        print("1.) Keep the first message with each ID")
+                        print("2.) Keep the last message with each ID")
+                        print("3.) Keep the first message with each ID and save the others to a report file")
+                        print("Enter anything else to cancel this action.\n")
+
+                        user_dp_input = input("Type a number and press \'enter\' to select an option: ")
+                        print("")
+                        duplicate_policies_by_input = {'1': "first", '2': "last", '3': "report"}
+                        if user_dp_input in duplicate_policies_by_input:
+                            duplicate_policy = duplicate_policies_by_input[user_dp_input]
+                            unique_messages, repeated_messages = resolve_duplicates(messages, duplicate_policy)
+                        else:
+                            print("Cancelling task...\n")
+                            proceed = False
+
+                    if proceed and len(unique_messages) > 0:
+                        if debug_mode:
+                            for msg in unique_messages:
+                                A, B, C, D = id_struct.pack(msg.id)
+                                print(f"Message ID {msg.id} Base-10 to Base-256: {D} | {C} | {B} | {A}")
+                            print(f"Total: {len(messages)} Used: {len(unique_messages)} Repeat: {len(repeated_messages)}\n")
+
+                        with stage(stats, "write") as write:
+                            write.records = write_msg(new_file_path, unique_messages)
+                            write.bytes = os.path.getsize(new_file_path)
+
+                    if proceed and repeated_messages:
+                        if duplicate_policy == "report":
+                            report_file_path = duplicate_report_path(new_file_path)
+                            write_duplicate_report(report_file_path, repeated_messages)
+                            print(f"The {len(repeated_messages)} message(s) that were left out are listed in {report_file_path}")
+                        print("*** Verify that each message has a unique non-zero ID in the spreadsheet. This may just be a duplicate entry glitch.\n")
+
+                    if proceed:
+                        print("Saved to " + excel_file_name_without_extension + ".msg\n")
+                        if stats:
+                            print(stats.summary(), "\n")
+                except FileNotFoundError:
+                      print("Error:", excel_file_path, "not found. Make sure path is correct, file is in the correct directory, or file exists.\n")
+                      proceed = False
+
+        if user_input == '3':
+            proceed = True
             if debug_mode:
-                # Unsuppress DeprecationWarning
+                # Unsuppress FutureWarnings
                 warnings.simplefilter('default')
-                warnings.filterwarnings('default')
             else:
-                # Suppress DeprecationWarning
+                # Suppress FutureWarnings
                 with warnings.catch_warnings():
-                    warnings.simplefilter(action='ignore', category=DeprecationWarning)
-                warnings.filterwarnings("ignore", category=DeprecationWarning)
+                    warnings.simplefilter(action='ignore', category=FutureWarning)
 
-            xls_file_path = xlsx_file_path + '.xls'
-            workbook_xlsx = openpyxl.load_workbook(xlsx_file_path + ".xlsx")
-            workbook_xls = xlwt.Workbook()
-            for sheet_name in workbook_xlsx.sheetnames:
-                sheet_xlsx = workbook_xlsx[sheet_name]
-                sheet_xls = workbook_xls.add_sheet(sheet_name)
-                for row_idx, row in enumerate(sheet_xlsx.iter_rows(min_row=1, values_only=True), start=1):
-                    for col_idx, value in enumerate(row, start=1):
-                        sheet_xls.write(row_idx - 1, col_idx - 1, value)
-            workbook_xls.save(xls_file_path)
-            print("Converted and saved to "+ xls_file_path + "\n")
-        else:
-            print("Error: File \'" + xlsx_file_path + ".xlsx\' does not exist or couldn't be found.\n")
+            print("NOTE: This merging action does NOT support merging formulas.")
+            print("Merged-message cells using formulas will say \'0\' instead, but all message lines (M1 - M8) will remain intact.\n")
 
-    if user_input == '7' or is_word_in_input('debug', user_input):
-        debug_mode = not debug_mode
-        if debug_mode:
-            print("Debug Mode enabled\n")
-        else:
-            print("Debug Mode disabled\n")
+            plu_file_path = str(input("Enter the PLU (.xlsx) file to add the messages to: "))
+            plu_name, plu_extension = os.path.splitext(plu_file_path)
+            plu_file_name_without_extension = os.path.basename(plu_name)
+            print("")
+            msg_file_path = str(input("Enter the msg (.xlsx) file be added: "))
+            msg_name, msg_extension = os.path.splitext(msg_file_path)
+            msg_file_name_without_extension = os.path.basename(msg_name)
+            print("")
 
-    elif user_input == '8':
-        print("Your current working directory is: " + str(os.getcwd()) + "\n")
-        
-        user_nd_input = input("Enter a new directory and press \'enter\' if you wish to change it (leave blank to stay): ")
-        print("")
-        if user_nd_input != "" or len(user_nd_input) != 0:
+            for input_file_path in (plu_file_path, msg_file_path):
+                if proceed and not os.path.exists(input_file_path):
+                    print("Error:", input_file_path, "not found. Make sure path is correct, file is in the correct directory, or file exists.")
+                    proceed = False
+
+            if proceed:
+                new_file_path = plu_file_name_without_extension + '+' + msg_file_name_without_extension + '.xlsx'
+
+                if os.path.exists(new_file_path):
+                    user_ow_input = input(f"The file \'{new_file_path}\' already exists. Do you want to overwrite it? (y/n): ").lower()
+                    if user_ow_input == 'y' or user_ow_input == "yes":
+                        try:
+                            os.remove(new_file_path)
+                            print(f"Overwriting {new_file_path} ...")
+                        except FileNotFoundError:
+                            print(f"Error: File {new_file_path} not found.")
+                        except PermissionError:
+                            print(f"Error: Permission denied to delete file {new_file_path}.")
+                            proceed = False
+                        except Exception as e:
+                            print(f"Error: An unknown error occurred. Exception: {e}")
+                            proceed = False
+                    elif user_ow_input == 'n' or user_ow_input == "no":
+                        print("Overwriting canceled.")
+                        proceed = False
+                    else:
+                        print("Unknown input. Operation and overwriting canceled. The existing file was not overwritten.")
+                        proceed = False
+
+            if proceed:
+                try:
+                    stats = TaskStats("append messages to PLU") if debug_mode else None
+                    append_messages_to_plu(plu_file_path, msg_file_path, new_file_path, stats)
+                    print(f"Merged and saved to {new_file_path}.\n")
+                    if stats:
+                        print(stats.summary(), "\n")
+                except PermissionError:
+                    print("Permission Error: Close", new_file_path, "if open.")
+
+
+        if user_input == '4':
+            proceed = True
+            plu_file_path = str(input("Enter the PLU file (.xls or .xlsx) to be GCode-sorted: "))
+            print("")
+            if plu_file_path.endswith(".xlsx") or plu_file_path.endswith(".xls"):
+                plu_name, plu_extension = os.path.splitext(plu_file_path)
+                plu_file_name_without_extension = os.path.basename(plu_name)
+            else:
+                print("Error: File type must be an Excel spreadsheet. (.xls or .xlsx)")
             try:
-                os.chdir(user_nd_input)
-                print("Your current working directory is now: " + str(os.getcwd())+ "\n")
+                if debug_mode:
+                    # Unsuppress DeprecationWarning
+                    # warnings.simplefilter(**original_sf_warning_settings)
+                    # warnings.filterwarnings(**original_fw_warning_settings)
+                    warnings.simplefilter('default')
+                    warnings.filterwarnings('default')
+                else:
+                    # Suppress DeprecationWarning
+                    with warnings.catch_warnings():
+                        warnings.simplefilter(action='ignore', category=DeprecationWarning)
+                    warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+                new_file_path = plu_file_name_without_extension + " g-sorted" + plu_extension
+                if os.path.exists(new_file_path):
+                    user_ow_input = input(f"The file \'{new_file_path}\' already exists. Do you want to overwrite it? (y/n): ").lower()
+                    if user_ow_input == 'y' or user_ow_input == "yes":
+                        try:
+                            os.remove(new_file_path)
+                            print(f"Overwriting {new_file_path} ...")
+                        except FileNotFoundError:
+                            print(f"Error: File {new_file_path} not found.")
+                        except PermissionError:
+                            print(f"Error: Permission denied to delete file {new_file_path}.")
+                            proceed = False
+                        except Exception as e:
+                            print(f"Error: An unknown error occurred. Exception: {e}")
+                            proceed = False
+                    elif user_ow_input == 'n' or user_ow_input == "no":
+                        print("Overwriting canceled.")
+                        proceed = False
+                    else:
+                        print("Unknown input. Operation and overwriting canceled. The existing file was not overwritten.")
+                        proceed = False
+
+                if proceed:
+                    stats = TaskStats("g-code sort") if debug_mode else None
+                    sort_plu_by_gcode(plu_file_path, new_file_path, stats)
+                    print("Sorted successfully. Saved to " + new_file_path + "\n")
+                    if stats:
+                        print(stats.summary(), "\n")
+                    if plu_extension == ".xls":
+                        print("NOTE: .xls files hold at most 65,535 PLUs. Use the newer .xlsx format for bigger PLU files.\n")
             except FileNotFoundError:
-                print(f"Error: Directory \'{user_nd_input}\' was not found.\n")
-                print("Your current working directory is: " + str(os.getcwd()) + "\n")
-            except Exception as e:
-                print(f"Error: An unknown error has occurred.\n Input: \'\'{user_nd_input}\'\'\n Exception: {e}\n")
-                print("Your current working directory is: " + str(os.getcwd()) + "\n")
-
-        msg_files = glob.glob("*.msg")
-        if len(msg_files) == 0:
-            print("There are no PLU message files in the current working directory.")
-        elif len(msg_files) == 1:
-            print("There is 1 PLU message file in the current working directory:\n")
-            print(msg_files[0])
-        else:
-            print("There are " + str(len(msg_files)) + " PLU message files in the current working directory:\n")
-            for file in msg_files:
-                print(file)
-        
-        print("")
+                print("Error:", (plu_file_path), "not found or incompatible. Make sure path is correct, file type is correct, file is in the correct directory, or file exists.\n")
+            except ValueError as e:
+                print("Error:", e, "\n")
+
+        if user_input == '5': # OLD -> NEW
+            print("NOTE: This does NOT delete or overwrite the original Excel file. This command makes a copy of the file with a different file extension.\n")
+            xls_file_path = input("Enter the name of the .xls file to be converted: ")
+            print("")
+            xls_file_path = xls_file_path.replace(".xls", "")
+            if os.path.exists(xls_file_path + ".xls"):
+                xlsx_file_path = xls_file_path + '.xlsx'
+                stats = TaskStats("xls to xlsx") if debug_mode else None
+                convert_xls(xls_file_path + ".xls", xlsx_file_path, stats)
+
+                print("Converted and saved to "+ xlsx_file_path+ "\n")
+                if stats:
+                    print(stats.summary(), "\n")
+            else:
+                print("Error: File \'" + xls_file_path + ".xls\' does not exist or couldn't be found.\n")
+
+        if user_input == '6': # NEW -> OLD
+            print("NOTE: This does NOT delete or overwrite the original Excel file. This command makes a copy of the file with a different file extension.")
+            print("ALSO NOTE: As .xls is an older format, many formulas do NOT work when converted from .xlsx to .xls.\n")
+            xlsx_file_path = input("Enter the name of the .xlsx file: ")
+            print("")
+            xlsx_file_path = xlsx_file_path.replace(".xlsx", "")
+            if os.path.exists(xlsx_file_path + ".xlsx"):
+                if debug_mode:
+                    # Unsuppress DeprecationWarning
+                    warnings.simplefilter('default')
+                    warnings.filterwarnings('default')
+                else:
+                    # Suppress DeprecationWarning
+                    with warnings.catch_warnings():
+                        warnings.simplefilter(action='ignore', category=DeprecationWarning)
+                    warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+                xls_file_path = xlsx_file_path + '.xls'
+                stats = TaskStats("xlsx to xls") if debug_mode else None
+                convert_xls(xlsx_file_path + ".xlsx", xls_file_path, stats)
+                print("Converted and saved to "+ xls_file_path + "\n")
+                if stats:
+                    print(stats.summary(), "\n")
+            else:
+                print("Error: File \'" + xlsx_file_path + ".xlsx\' does not exist or couldn't be found.\n")
+
+        if user_input == '7' or is_word_in_input('debug', user_input):
+            debug_mode = not debug_mode
+            if debug_mode:
+                print("Debug Mode enabled\n")
+            else:
+                print("Debug Mode disabled\n")
 
-        xlsx_files = glob.glob("*.xlsx")
-        xls_files = glob.glob("*.xls")
+        elif user_input == '8':
+            print("Your current working directory is: " + str(os.getcwd()) + "\n")
 
-        if (len(xlsx_files) + len(xls_files)) == 0:
-            print("There are no Excel files in the current working directory.\n")
-        elif (len(xlsx_files) + len(xls_files)) == 1:
-            print("There is 1 Excel file in the current working directory:\n")
-            if (len(xlsx_files) > len(xls_files)):
-                print(xlsx_files[0])
+            user_nd_input = input("Enter a new directory and press \'enter\' if you wish to change it (leave blank to stay): ")
+            print("")
+            if user_nd_input != "" or len(user_nd_input) != 0:
+                try:
+                    os.chdir(user_nd_input)
+                    print("Your current working directory is now: " + str(os.getcwd())+ "\n")
+                except FileNotFoundError:
+                    print(f"Error: Directory \'{user_nd_input}\' was not found.\n")
+                    print("Your current working directory is: " + str(os.getcwd()) + "\n")
+                except Exception as e:
+                    print(f"Error: An unknown error has occurred.\n Input: \'\'{user_nd_input}\'\'\n Exception: {e}\n")
+                    print("Your current working directory is: " + str(os.getcwd()) + "\n")
+
+            msg_files = glob.glob("*.msg")
+            if len(msg_files) == 0:
+                print("There are no PLU message files in the current working directory.")
+            elif len(msg_files) == 1:
+                print("There is 1 PLU message file in the current working directory:\n")
+                print(msg_files[0])
             else:
-                print(xls_files[0])
-        else:
-            print("There are " + str((len(xlsx_files) + len(xls_files))) + " Excel files in the current working directory:\n")
-            if (len(xlsx_files) > 0):
-                for file in xlsx_files:
+                print("There are " + str(len(msg_files)) + " PLU message files in the current working directory:\n")
+                for file in msg_files:
                     print(file)
-                print("")
-            if (len(xls_files) > 0):
-                for file in xls_files:
-                    print(file)
-                print("")
 
-    elif user_input == '9' or is_word_in_input('help', user_input):
-        print("`7MM\"\"\"Mq.`7MMM.     ,MMF'`YMM'   `MP\'")        
-        print("  MM   `MM. MMMb    dPMM    VMb.  ,P")          
-        print("  MM   ,M9  M YM   ,M MM     `MM.M\'        gp") 
-        print("  MMmmdM9   M  Mb  M\' MM       MMb         \"\"") 
-        print("  MM        M  YM.P\'  MM     ,M'`Mb.") 
-        print("  MM        M  `YM\'   MM    ,P   `MM.      ,,") 
-        print(".JMML.    .JML. `\'  .JMML..MM:.  .:MMa.    db      PLU-Message-Excel File Manager for LP-Works\n")
-
-        print("This is the PLU-msg-Excel file converter and merger version 1.0.0\n")
-        print("This program is meant to facilitate the usage of the LP-Works program for CAS scales by providing the following utilities:\n")
-        
-        print("1.) A PLU message file to Excel file converter. This takes in a PLU message file (.msg) and converts it to an Excel spreadsheet (.xlsx).")
-        print("Each message in a message file is broken up into eight separate messages of 50 characters, so the spreadsheet shows each message line and the merged results (no space between, a space between, and a newline between) of each message for each corresponding message ID.\n")
-
-        print("2.) An Excel file to PLU message file converter. This takes in an Excel spreadsheet (.xlsx) and converts it to a PLU message file (.msg).")
-        print("THIS REQUIRES SPECIFIC FORMATTING: [ID M1 M2 ... M8] For each ID in the first column, the first 50 character contents for each of the eight message lines will be merged to form the contents of the full message.\n")
-
-        print("3.) A message file spreadsheet to PLU file spreadsheet appender. This takes the produced message file spreadsheet and appends it to a PLU spreadsheet by matching the message ID to the MessageNo column.")
-        print("Each PLU has a MessageNo, which can be 0 (no message) or some number X. If there is an X-ID message, it will add that message info (M1 through M8 and the merged results) to the columns after PLU information.\n")
-
-        print("4.) A PLU spreadsheet g-code sorter. This takes a PLU spreadsheet and sorts the PLU entries by its g-code.")
-        print("Each PLU entry has a g-code. If modifications need to be made on certain g-coded entries, this can facilitate the search for those items.\n")
-
-        print("5.) A .xls to .xlsx converter. Takes a pre-2007 format Excel spreadsheet file and converts it and its contents to the newer 2007 format Excel spreadsheet file.\n")
-
-        print("6.) A .xlsx to .xls converter. Takes the newer 2007 format Excel spreadsheet file and converts it and its contents to the older pre-2007 Excel spreadsheet file, compatible with LP-Works, though some .xlsx files can work with LP-Works.\n")
-
-        print("There is also a 7.) \"debug mode\" option for testing purposes and a 8.) \"get / change directory info\" command to see and set the current working directory and view compatible files.\n")
-
-    elif user_input == '0' or is_word_in_input('exit', user_input) or is_word_in_input('quit', user_input):
-        # print("Exiting program.")
-        break  # Exit while True loop
-
-    elif user_input.lower().startswith("cd ") and len(user_input) > 3:
-        os.chdir(user_input[3:])
-    elif user_input.lower() == "pwd":
-        print(str(os.getcwd()), "\n")
-    elif is_word_in_input('ls', user_input) or is_word_in_input('dir', user_input):
-        files = os.listdir()
-        for file in files:
-            print(file)
-    elif user_input.lower().startswith("mkdir ") and len(user_input) > 6:
-        newdir = user_input[6:]
-        try:
-            os.makedirs(newdir)
-            print(f"Directory '{newdir}' created successfully.\n")
-        except FileExistsError:
-            print(f"Error: Directory '{newdir}' already exists.\n")
-        except Exception as e:
-            print(f"Error: An unknown error occurred. Exception: {e}\n")
-    elif user_input.lower().startswith("mv ") and len(user_input) > 5:
-        mv_inputs = shlex.split(user_input[3:])
-        if len(mv_inputs) == 2:
-            old_filename, new_filename = mv_inputs
+            print("")
+
+            xlsx_files = glob.glob("*.xlsx")
+            xls_files = glob.glob("*.xls")
+
+            if (len(xlsx_files) + len(xls_files)) == 0:
+                print("There are no Excel files in the current working directory.\n")
+            elif (len(xlsx_files) + len(xls_files)) == 1:
+                print("There is 1 Excel file in the current working directory:\n")
+                if (len(xlsx_files) > len(xls_files)):
+                    print(xlsx_files[0])
+                else:
+                    print(xls_files[0])
+            else:
+                print("There are " + str((len(xlsx_files) + len(xls_files))) + " Excel files in the current working directory:\n")
+                if (len(xlsx_files) > 0):
+                    for file in xlsx_files:
+                        print(file)
+                    print("")
+                if (len(xls_files) > 0):
+                    for file in xls_files:
+                        print(file)
+                    print("")
+
+        elif user_input == '9' or is_word_in_input('help', user_input):
+            print("`7MM\"\"\"Mq.`7MMM.     ,MMF'`YMM'   `MP\'")        
+            print("  MM   `MM. MMMb    dPMM    VMb.  ,P")          
+            print("  MM   ,M9  M YM   ,M MM     `MM.M\'        gp") 
+            print("  MMmmdM9   M  Mb  M\' MM       MMb         \"\"") 
+            print("  MM        M  YM.P\'  MM     ,M'`Mb.") 
+            print("  MM        M  `YM\'   MM    ,P   `MM.      ,,") 
+            print(".JMML.    .JML. `\'  .JMML..MM:.  .:MMa.    db      PLU-Message-Excel File Manager for LP-Works\n")
+
+            print("This is the PLU-msg-Excel file converter and merger version 1.0.0\n")
+            print("This program is meant to facilitate the usage of the LP-Works program for CAS scales by providing the following utilities:\n")
+
+            print("1.) A PLU message file to Excel file converter. This takes in a PLU message file (.msg) and converts it to an Excel spreadsheet (.xlsx).")
+            print("Each message in a message file is broken up into eight separate messages of 50 characters, so the spreadsheet shows each message line and the merged results (no space between, a space between, and a newline between) of each message for each corresponding message ID.\n")
+
+            print("2.) An Excel file to PLU message file converter. This takes in an Excel spreadsheet (.xlsx) and converts it to a PLU message file (.msg).")
+            print("THIS REQUIRES SPECIFIC FORMATTING: [ID M1 M2 ... M8] For each ID in the first column, the first 50 character contents for each of the eight message lines will be merged to form the contents of the full message.\n")
+
+            print("3.) A message file spreadsheet to PLU file spreadsheet appender. This takes the produced message file spreadsheet and appends it to a PLU spreadsheet by matching the message ID to the MessageNo column.")
+            print("Each PLU has a MessageNo, which can be 0 (no message) or some number X. If there is an X-ID message, it will add that message info (M1 through M8 and the merged results) to the columns after PLU information.\n")
+
+            print("4.) A PLU spreadsheet g-code sorter. This takes a PLU spreadsheet and sorts the PLU entries by its g-code.")
+            print("Each PLU entry has a g-code. If modifications need to be made on certain g-coded entries, this can facilitate the search for those items.\n")
+
+            print("5.) A .xls to .xlsx converter. Takes a pre-2007 format Excel spreadsheet file and converts it and its contents to the newer 2007 format Excel spreadsheet file.\n")
+
+            print("6.) A .xlsx to .xls converter. Takes the newer 2007 format Excel spreadsheet file and converts it and its contents to the older pre-2007 Excel spreadsheet file, compatible with LP-Works, though some .xlsx files can work with LP-Works.\n")
+
+            print("10.) A .msg file patcher. This takes an Excel or CSV file with changed messages [ID M1 M2 ... M8] and writes them straight into an existing .msg file.")
+            print("Messages whose ID is already in the file replace the old message, and messages with a new ID are added to the end. The rest of the file is not converted or rewritten.\n")
+
+            print("11.) A .msg / Excel file sync. This converts a .msg file to an Excel file (or the other way around) and remembers every message.")
+            print("Running it again does nothing when the source file has not changed since the last sync. When it has, a .msg file only gets the messages that were added or changed written into it, and an Excel file is written again.\n")
+
+            print("12.) A batch converter. This converts every .msg file (or every Excel file) in a directory and its subdirectories, several files at a time.")
+            print("Each converted file is saved next to the original with the same name, and a file that fails to convert does not stop the others.\n")
+
+            print("13.) A .msg file sorter. This saves a copy of a .msg file with its messages in ID order, without going through Excel.")
+            print("Messages that share an ID keep their order. Very large files are sorted in parts on disk.\n")
+
+            print("14.) .msg file merging, filtering and splitting. This combines several .msg files into one, copies the messages with chosen IDs to a new file,")
+            print("or splits a file into one file per ID range (for example one per store). The messages are copied as they are, without going through Excel.\n")
+
+            print("There is also a 7.) \"debug mode\" option for testing purposes and a 8.) \"get / change directory info\" command to see and set the current working directory and view compatible files.\n")
+
+        elif user_input == '10':
+            print("NOTE: This updates the .msg file itself. Messages with an ID already in the file are replaced,")
+            print("and messages with a new ID are added to the end. The changes file needs an ID column and M1 - M8 columns.\n")
+
+            msg_file_path = str(input("Enter the name of the msg file to update: "))
+            print("")
+            update_file_path = str(input("Enter the name of the Excel or CSV file with the changed messages: "))
+            print("")
+            try:
+                stats = TaskStats("patch .msg") if debug_mode else None
+                with stage(stats, "read") as read:
+                    updates = read_message_updates(update_file_path)
+                    read.records = len(updates)
+                    read.bytes = os.path.getsize(update_file_path)
+                replaced_ids, appended_ids = patch_msg(msg_file_path, updates, stats)
+                print(f"Replaced {len(replaced_ids)} message(s) and added {len(appended_ids)} new message(s) in {msg_file_path}\n")
+                if debug_mode:
+                    print("Replaced ID(s):", replaced_ids)
+                    print("Added ID(s):", appended_ids, "\n")
+                if stats:
+                    print(stats.summary(), "\n")
+            except FileNotFoundError as e:
+                print("Error:", e.filename, "not found. Make sure path is correct, file is in the correct directory, or file exists.\n")
+            except PermissionError:
+                print(f"Error: Permission denied to update file {msg_file_path}. Close it if it is open.\n")
+            except (KeyError, ValueError) as e:
+                print(f"Error: The changes file could not be read. Make sure it has an ID column with whole numbers. ({e})\n")
+
+        elif user_input == '11':
+            print("NOTE: A sync converts a .msg file to the same-named .xlsx file (or a .xlsx file to the same-named .msg file)")
+            print("and remembers each message. Later syncs of the same file only update the messages that were added, changed, or removed.")
+            print("New messages are added to the end of the output.\n")
+
+            source_file_path = str(input("Enter the name of the .msg or .xlsx file to sync from: "))
+            print("")
+            source_name, source_extension = os.path.splitext(source_file_path)
+            source_file_name_without_extension = os.path.basename(source_name)
             try:
-                os.rename(old_filename, new_filename)
-                print(f"File \'{old_filename}\' renamed to \'{new_filename}\' successfully.\n")
+                stats = TaskStats("sync") if debug_mode else None
+                if source_extension.lower() == ".msg":
+                    output_file_path = source_file_name_without_extension + ".xlsx"
+                    result = sync_msg_to_xlsx(source_file_path, output_file_path, stats)
+                elif source_extension.lower() in (".xlsx", ".xls"):
+                    output_file_path = source_file_name_without_extension + ".msg"
+                    result = sync_xlsx_to_msg(source_file_path, output_file_path, stats=stats)
+                else:
+                    result = None
+                    print("Error: File type must be a .msg file or an Excel spreadsheet (.xls or .xlsx)\n")
+                if result is not None:
+                    if result.full_rewrite:
+                        print(f"Converted all {len(result.added)} message(s) to {output_file_path}\n")
+                    else:
+                        print(f"Synced {output_file_path}: {len(result.added)} added, {len(result.changed)} changed, {len(result.removed)} removed\n")
+                    if result.repeated_ids:
+                        print(f"!!! ALERT: {len(result.repeated_ids)} message(s) reused an ID and were left out. Only the first message with each ID was saved.")
+                        print("Repeat ID(s):", sorted(set(result.repeated_ids)))
+                        print("*** Verify that each message has a unique non-zero ID in the spreadsheet. This may just be a duplicate entry glitch.\n")
+                    if stats:
+                        print(stats.summary(), "\n")
             except FileNotFoundError:
-                print(f"Error: File \'{old_filename}\' not found.\n")
+                print("Error:", source_file_path, "not found. Make sure path is correct, file is in the correct directory, or file exists.\n")
             except PermissionError:
-                print(f"Error: Permission denied to rename file \'{old_filename}\' or file is currently open.\n")
+                print("Permission Error: Close", output_file_path, "if open.\n")
+
+        elif user_input == '12':
+            print("NOTE: Each file is converted to a same-named file next to it. Subdirectories are included.")
+            print("Unsorted .msg files do not get a separate sorted copy, and reused IDs in Excel files keep the first message.\n")
+
+            print("Select a conversion:")
+            print("1.) Convert every .msg file to an Excel file")
+            print("2.) Convert every Excel file to a .msg file")
+            print("Enter anything else to cancel this action.\n")
+
+            user_bd_input = input("Type a number and press \'enter\' to select an option: ")
+            print("")
+            batch_directions_by_input = {'1': "msg-to-xlsx", '2': "xlsx-to-msg"}
+            if user_bd_input in batch_directions_by_input:
+                batch_direction = batch_directions_by_input[user_bd_input]
+                batch_directory = input("Enter the directory to convert (leave blank for the current directory): ") or os.getcwd()
+                user_ow_input = input("Overwrite files that already exist? Files that exist are skipped otherwise. (y/n): ").lower()
+                batch_overwrite = user_ow_input == 'y' or user_ow_input == "yes"
+                print("")
+
+                def print_batch_progress(result, done, total):
+                    if result.status == "failed":
+                        print(f"[{done}/{total}] FAILED {result.source}: {result.error}")
+                    elif result.status == "skipped":
+                        print(f"[{done}/{total}] Skipped {result.source} ({result.error or result.output + ' already exists'})")
+                    else:
+                        print(f"[{done}/{total}] Converted {result.source} to {result.output} ({result.seconds:.1f} s)")
+
+                try:
+                    # The files are converted in other processes, so only the
+                    # time each one took is known here
+                    stats = TaskStats("batch convert") if debug_mode else None
+                    results = convert_directory(batch_directory, batch_direction, overwrite=batch_overwrite, progress=print_batch_progress)
+                    if len(results) == 0:
+                        print("There are no files to convert in", batch_directory)
+                    failed = [result for result in results if result.status == "failed"]
+                    converted = [result for result in results if result.status == "converted"]
+                    print(f"\nConverted {len(converted)} file(s), skipped {len(results) - len(converted) - len(failed)}, failed {len(failed)}.\n")
+                    if failed:
+                        print("Failed file(s):")
+                        for result in failed:
+                            print(" ", result.source)
+                        print("")
+                    if stats:
+                        for result in converted:
+                            stats.add(os.path.relpath(result.source, batch_directory), result.seconds)
+                        print(stats.summary(), "\n")
+                except FileNotFoundError:
+                    print(f"Error: Directory \'{batch_directory}\' was not found.\n")
+            else:
+                print("Cancelling task...\n")
+
+        elif user_input == '13':
+            msg_file_path = str(input("Enter the name of the msg file to sort: "))
+            print("")
+            msg_name, msg_extension = os.path.splitext(msg_file_path)
+            new_file_path = os.path.basename(msg_name) + " sorted.msg"
+            proceed = True
+            if not os.path.exists(msg_file_path):
+                print("Error:", msg_file_path, "not found. Make sure path is correct, file is in the correct directory, or file exists.\n")
+                proceed = False
+            elif os.path.exists(new_file_path):
+                user_ow_input = input(f"The file \'{new_file_path}\' already exists. Do you want to overwrite it? (y/n): ").lower()
+                if not (user_ow_input == 'y' or user_ow_input == "yes"):
+                    print("Overwriting canceled.\n")
+                    proceed = False
+
+            if proceed:
+                try:
+                    stats = TaskStats("sort .msg") if debug_mode else None
+                    count = sort_msg(msg_file_path, new_file_path, stats=stats)
+                    print(f"Sorted {count} message(s) and saved to {new_file_path}\n")
+                    if stats:
+                        print(stats.summary(), "\n")
+                except PermissionError:
+                    print("Permission Error: Close", new_file_path, "if open.\n")
+
+        elif user_input == '14':
+            print("Select a task:")
+            print("1.) Merge several .msg files into one")
+            print("2.) Copy the messages with some IDs to a new .msg file")
+            print("3.) Split a .msg file into one file per ID range")
+            print("Enter anything else to cancel this action.\n")
+
+            user_mo_input = input("Type a number and press \'enter\' to select an option: ")
+            print("")
+            stats = TaskStats("merge / filter / split .msg") if debug_mode else None
+            try:
+                if user_mo_input == '1':
+                    msg_file_paths = shlex.split(input("Enter the .msg files to merge, in order, separated by spaces (use quotes around names with spaces): "))
+                    new_file_path = input("Enter the name of the merged .msg file: ")
+                    print("")
+                    print("Select how to handle messages that reuse an ID:")
+                    print("1.) Keep the first message with each ID")
+                    print("2.) Keep the last message with each ID")
+                    print("3.) Keep the first message with each ID and save the others to a report file")
+                    print("Enter anything else to cancel this action.\n")
+                    user_dp_input = input("Type a number and press \'enter\' to select an option: ")
+                    print("")
+                    duplicate_policies_by_input = {'1': "first", '2': "last", '3': "report"}
+                    if user_dp_input in duplicate_policies_by_input:
+                        count, repeated_ids = merge_msg(msg_file_paths, new_file_path, duplicate_policies_by_input[user_dp_input], stats)
+                        if repeated_ids:
+                            print(f"!!! ALERT: {len(repeated_ids)} message(s) reused an ID and were left out. Repeat ID(s):", sorted(set(repeated_ids)))
+                            if user_dp_input == '3':
+                                print("They are listed in", duplicate_report_path(new_file_path))
+                        print(f"Merged {count} message(s) into {new_file_path}\n")
+                    else:
+                        print("Cancelling task...\n")
+                elif user_mo_input == '2':
+                    msg_file_path = input("Enter the name of the msg file: ")
+                    id_ranges = parse_id_ranges(input("Enter the IDs or ID ranges to keep (like 12, 100-199, 2000-): "))
+                    new_file_path = input("Enter the name of the new .msg file: ")
+                    print("")
+                    count = filter_msg(msg_file_path, new_file_path, ranges=id_ranges, stats=stats)
+                    print(f"Saved {count} message(s) to {new_file_path}\n")
+                elif user_mo_input == '3':
+                    msg_file_path = input("Enter the name of the msg file: ")
+                    id_ranges = parse_id_ranges(input("Enter the ID ranges, one per new file (like 1-999, 1000-1999, 2000-): "))
+                    user_rest_input = input("Also save the messages outside every range to their own file? (y/n): ").lower()
+                    print("")
+                    rest_file_path = os.path.splitext(msg_file_path)[0] + " rest.msg" if user_rest_input == 'y' or user_rest_input == "yes" else None
+                    for new_file_path, count in split_msg(msg_file_path, id_ranges, rest_file_path=rest_file_path, stats=stats):
+                        print(f"Saved {count} message(s) to {new_file_path}")
+                    print("")
+                else:
+                    stats = None
+                    print("Cancelling task...\n")
+                if stats:
+                    print(stats.summary(), "\n")
+            except FileNotFoundError as e:
+                print("Error:", e.filename, "not found. Make sure path is correct, file is in the correct directory, or file exists.\n")
+            except PermissionError as e:
+                print(f"Permission Error: Close {e.filename} if open.\n")
+            except ValueError as e:
+                print(f"Error: {e}\n")
+
+        elif user_input == '0' or is_word_in_input('exit', user_input) or is_word_in_input('quit', user_input):
+            # print("Exiting program.")
+            break  # Exit while True loop
+
+        elif user_input.lower().startswith("cd ") and len(user_input) > 3:
+            os.chdir(user_input[3:])
+        elif user_input.lower() == "pwd":
+            print(str(os.getcwd()), "\n")
+        elif is_word_in_input('ls', user_input) or is_word_in_input('dir', user_input):
+            files = os.listdir()
+            for file in files:
+                print(file)
+        elif user_input.lower().startswith("mkdir ") and len(user_input) > 6:
+            newdir = user_input[6:]
+            try:
+                os.makedirs(newdir)
+                print(f"Directory '{newdir}' created successfully.\n")
+            except FileExistsError:
+                print(f"Error: Directory '{newdir}' already exists.\n")
             except Exception as e:
                 print(f"Error: An unknown error occurred. Exception: {e}\n")
+        elif user_input.lower().startswith("mv ") and len(user_input) > 5:
+            mv_inputs = shlex.split(user_input[3:])
+            if len(mv_inputs) == 2:
+                old_filename, new_filename = mv_inputs
+                try:
+                    os.rename(old_filename, new_filename)
+                    print(f"File \'{old_filename}\' renamed to \'{new_filename}\' successfully.\n")
+                except FileNotFoundError:
+                    print(f"Error: File \'{old_filename}\' not found.\n")
+                except PermissionError:
+                    print(f"Error: Permission denied to rename file \'{old_filename}\' or file is currently open.\n")
+                except Exception as e:
+                    print(f"Error: An unknown error occurred. Exception: {e}\n")
+            else:
+                print(f"Error: 2 inputs required: The old filename and a new filename. Inputs: {mv_inputs}\n")
+
         else:
-            print(f"Error: 2 inputs required: The old filename and a new filename. Inputs: {mv_inputs}\n")
+            if not (user_input.isdigit() and len(user_input) == 1):
+                print(f"Unrecognized input: {user_input}\n")
 
-    else:
-        if not (user_input.isdigit() and len(user_input) == 1):
-            print(f"Unrecognized input: {user_input}\n")
+        input("Press \'enter\' to continue...")
+        print("")
 
-    input("Press \'enter\' to continue...")
-    print("")
+    # Out of while True loop:
+    print("PLU/MSG/Excel Python program exited.\n")
 
-# Out of while True loop:
-print("PLU/MSG/Excel Python program exited.\n")
\ No newline at end of file
+if __name__ == "__main__":
+    # Any arguments run a single task without the menu (see pmx.py --help)
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
+    main()
@@ -0,0 +1,56 @@
+# romero@engineer.com
+
+# Shared core of the PLU/MSG/Excel file manager used by pmx.py and pmxUI.py.
+# Everything here can be used from other programs. None of it prompts, prints
+# or opens a window, and errors are raised as exceptions. The exceptions are
+# pmxcore.cli, the command line front end, and Message.print(). Progress and
+# debug output is handed to callbacks such as on_merged and progress, which
+# the front ends print.
+#
+#   import pmxcore
+#
+#   messages = pmxcore.read_msg("PLU.msg")
+#   pmxcore.write_msg("copy.msg", messages)
+#   pmxcore.msg_to_xlsx("PLU.msg", "PLU.xlsx")
+#   pmxcore.xlsx_to_msg("PLU.xlsx", "PLU.msg", duplicate_policy="report")
+#   pmxcore.append_messages_to_plu("PLU list.xlsx", "PLU.xlsx")
+#   pmxcore.sort_plu_by_gcode("PLU list.xlsx")
+#   pmxcore.convert_xls("PLU list.xls")
+#   pmxcore.sort_msg("PLU.msg", "PLU sorted.msg")
+#   pmxcore.merge_msg(["store 1.msg", "store 2.msg"], "all.msg")
+#
+# The file tasks take an optional stats=pmxcore.TaskStats(...) to time their
+# stages; stats.summary() gives the table pmx.py prints in debug mode.
+#
+# pandas, NumPy, openpyxl, xlsxwriter and xlwt take a while to import, so they
+# are only imported by the functions that need them. MessageTable is built on
+# NumPy and is imported the first time pmxcore.MessageTable is used.
+
+from .records import (
+    Message,
+    decode_message,
+    decode_messages,
+    encode_message,
+    iter_messages,
+    read_messages,
+    write_messages,
+)
+from .batch import convert_directory
+from .convert import MsgExport, msg_to_xlsx, read_msg, sort_outputs, write_msg, xlsx_to_msg
+from .duplicates import DuplicateIdError, duplicate_policies, resolve_duplicates
+from .excel import export_messages_to_excel
+from .index import MsgIndex
+from .journal import recover_msg
+from .msgops import filter_msg, iter_records, merge_msg, parse_id_ranges, sort_msg, split_msg
+from .patch import patch_msg, read_message_updates
+from .plu import append_messages_to_plu, merge_plu_messages, sort_plu_by_gcode
+from .reader import MessageRecord, MsgReader
+from .stats import TaskStats
+from .sync import sync_msg_to_xlsx, sync_xlsx_to_msg
+from .workbook import convert_xls, xls_to_xlsx, xlsx_to_xls
+
+def __getattr__(name):
+    if name == "MessageTable":
+        from .table import MessageTable
+        return MessageTable
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
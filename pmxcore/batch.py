@@ -0,0 +1,111 @@
+# romero@engineer.com
+
+# Converting every .msg or Excel file in a directory tree at once.
+#
+#   results = convert_directory("stores", "msg-to-xlsx", workers=4)
+#
+# Each file is converted in its own worker process, so several files are
+# worked on at the same time and a file that fails does not stop the others.
+# Outputs are saved next to their source files. progress, if given, is called
+# in the main process as progress(result, files done, total files) each time
+# a file finishes.
+
+import collections
+import concurrent.futures
+import os
+import time
+
+from .convert import msg_to_xlsx, xlsx_to_msg
+
+batch_directions = {
+    "msg-to-xlsx": ((".msg",), ".xlsx"),
+    "xlsx-to-msg": ((".xlsx", ".xls"), ".msg"),
+}
+
+# Windows cannot wait on more than 61 worker processes
+max_batch_workers = 61
+
+BatchResult = collections.namedtuple("BatchResult", ["source", "output", "status", "error", "seconds"])
+
+def find_batch_files(directory, direction, recursive=True):
+    extensions, _ = batch_directions[direction]
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            # Skip the lock files Excel leaves next to open spreadsheets
+            if name.lower().endswith(extensions) and not name.startswith("~$"):
+                found.append(os.path.join(root, name))
+        if not recursive:
+            break
+    return found
+
+def batch_output_path(source_file_path, direction):
+    _, output_extension = batch_directions[direction]
+    return os.path.splitext(source_file_path)[0] + output_extension
+
+# Returns (sources to convert, {source left out: source that has its output}).
+# When more than one source would be saved to the same output, like
+# "store.xlsx" and "store.xls", only the one whose extension comes first in
+# batch_directions is converted.
+def plan_batch_outputs(sources, direction):
+    extensions, _ = batch_directions[direction]
+    winners = {}
+    for source in sorted(sources, key=lambda source: extensions.index(os.path.splitext(source)[1].lower())):
+        winners.setdefault(os.path.normcase(batch_output_path(source, direction)), source)
+    chosen = set(winners.values())
+    conflicts = {source: winners[os.path.normcase(batch_output_path(source, direction))] for source in sources if source not in chosen}
+    return [source for source in sources if source in chosen], conflicts
+
+# Runs in a worker process. Errors are returned as text because not every
+# exception can be sent back to the main process.
+def convert_batch_file(source_file_path, output_file_path, direction, overwrite, alt_merge_mode, duplicate_policy):
+    start = time.perf_counter()
+    if os.path.exists(output_file_path) and not overwrite:
+        return BatchResult(source_file_path, output_file_path, "skipped", None, 0.0)
+    try:
+        if direction == "msg-to-xlsx":
+            # One output per file, so the directory can be converted back as is
+            msg_to_xlsx(source_file_path, output_file_path, alt_merge_mode, sort_output="unsorted")
+        else:
+            xlsx_to_msg(source_file_path, output_file_path, duplicate_policy)
+    except Exception as e:
+        return BatchResult(source_file_path, output_file_path, "failed", f"{type(e).__name__}: {e}", time.perf_counter() - start)
+    return BatchResult(source_file_path, output_file_path, "converted", None, time.perf_counter() - start)
+
+# Returns a BatchResult for every file found, in the order they finished.
+# workers defaults to the number of CPUs. A file left out by
+# plan_batch_outputs() is "skipped", with the reason in its error.
+def convert_directory(directory, direction, workers=None, overwrite=False, recursive=True, alt_merge_mode=False, duplicate_policy="first", progress=None):
+    if direction not in batch_directions:
+        raise ValueError(f"Unknown batch direction '{direction}'. Use one of: {', '.join(batch_directions)}")
+    if not os.path.isdir(directory):
+        raise FileNotFoundError(2, "No such directory", directory)
+
+    found = find_batch_files(directory, direction, recursive)
+    if not found:
+        return []
+    sources, conflicts = plan_batch_outputs(found, direction)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(sources), max_batch_workers))
+
+    results = []
+    for source, winner in conflicts.items():
+        results.append(BatchResult(source, batch_output_path(source, direction), "skipped", f"{winner} is saved to the same file", 0.0))
+        if progress is not None:
+            progress(results[-1], len(results), len(found))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(convert_batch_file, source, batch_output_path(source, direction), direction, overwrite, alt_merge_mode, duplicate_policy): source
+            for source in sources
+        }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself died
+                source = futures[future]
+                result = BatchResult(source, batch_output_path(source, direction), "failed", f"{type(e).__name__}: {e}", 0.0)
+            results.append(result)
+            if progress is not None:
+                progress(result, len(results), len(found))
+    return results
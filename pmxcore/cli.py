@@ -0,0 +1,358 @@
+# romero@engineer.com
+
+# Command line interface for running the pmx tasks without any prompts, for
+# scheduled jobs and other programs:
+#
+#   python pmx.py msg2xlsx PLU.msg --merge formula
+#   python pmx.py xlsx2msg PLU.xlsx --duplicates report --if-exists overwrite
+#   python pmx.py batch stores --to xlsx --workers 4
+#   python pmx.py <command> --help
+#
+# Running pmx.py without any arguments opens the menu as before. Outputs are
+# saved next to the input file unless -o is given. An output that already
+# exists is handled by --if-exists: fail (the default), skip or overwrite.
+#
+# Exit codes:
+#   0  Finished, or skipped with --if-exists skip
+#   1  The task failed, or some files of a batch failed
+#   2  The command line is not valid
+#   3  The output already exists and --if-exists is fail
+
+import argparse
+import glob
+import os
+import sys
+import warnings
+
+from .batch import convert_directory
+from .convert import msg_to_xlsx, sort_outputs, xlsx_to_msg
+from .duplicates import DuplicateIdError, duplicate_policies, duplicate_report_path
+from .msgops import filter_msg, merge_msg, parse_id_ranges, sort_memory_bytes, sort_msg, sorted_msg_path, split_msg, split_msg_path
+from .patch import patch_msg, read_message_updates
+from .plu import append_messages_to_plu, gsorted_path, plu_messages_path, sort_plu_by_gcode
+from .stats import TaskStats, stage
+from .sync import sync_msg_to_xlsx, sync_xlsx_to_msg
+from .workbook import xls_to_xlsx, xlsx_to_xls
+
+exit_ok = 0
+exit_failed = 1
+exit_usage = 2
+exit_output_exists = 3
+
+if_exists_policies = ("fail", "skip", "overwrite")
+
+def print_error(text):
+    print(f"pmx: error: {text}", file=sys.stderr)
+
+# Returns None if the task can write output_file_path, or the exit code to
+# stop with
+def check_output(output_file_path, if_exists):
+    if not os.path.exists(output_file_path) or if_exists == "overwrite":
+        return None
+    if if_exists == "skip":
+        print(f"Skipped: {output_file_path} already exists")
+        return exit_ok
+    print_error(f"{output_file_path} already exists. Use --if-exists overwrite or --if-exists skip.")
+    return exit_output_exists
+
+# Shows the merged columns of each message as it is exported, with --debug
+# and in debug mode
+def print_merged_columns(message, merged):
+    print("Merged:", merged[0])
+    print("Merged w/ space:", merged[1])
+    #print("Merged w/ newline:", merged[2])
+
+def run_msg2xlsx(args):
+    output_file_path = args.output or os.path.splitext(args.msg_file)[0] + ".xlsx"
+    status = check_output(output_file_path, args.if_exists)
+    if status is not None:
+        return status
+    sort_output = "unsorted" if args.no_sorted_copy else args.sort
+    export = msg_to_xlsx(args.msg_file, output_file_path, args.merge == "formula", sort_output, print_merged_columns if args.debug else None, args.task_stats)
+    for written_file_path in export.written:
+        print("Saved to", written_file_path)
+    if not export.is_sorted and sort_output == "both":
+        print("The IDs were out of order, so a sheet sorted by ID was added.")
+    if export.duplicate_ids:
+        print(f"{len(export.duplicate_ids)} ID(s) are used more than once:", export.duplicate_ids)
+    return exit_ok
+
+def run_xlsx2msg(args):
+    output_file_path = args.output or os.path.splitext(args.excel_file)[0] + ".msg"
+    status = check_output(output_file_path, args.if_exists)
+    if status is not None:
+        return status
+    messages, repeated = xlsx_to_msg(args.excel_file, output_file_path, args.duplicates, args.task_stats)
+    if repeated:
+        print(f"{len(repeated)} message(s) reused an ID and were left out:", sorted({message.id for message in repeated}))
+    print(f"Saved {len(messages)} message(s) to {output_file_path}")
+    return exit_ok
+
+def run_append(args):
+    output_file_path = args.output or plu_messages_path(args.plu_file, args.msg_file)
+    status = check_output(output_file_path, args.if_exists)
+    if status is not None:
+        return status
+    append_messages_to_plu(args.plu_file, args.msg_file, output_file_path, args.task_stats)
+    print(f"Merged and saved to {output_file_path}")
+    return exit_ok
+
+def run_gsort(args):
+    output_file_path = args.output or gsorted_path(args.plu_file)
+    status = check_output(output_file_path, args.if_exists)
+    if status is not None:
+        return status
+    sort_plu_by_gcode(args.plu_file, output_file_path, args.task_stats)
+    print(f"Sorted and saved to {output_file_path}")
+    return exit_ok
+
+def run_xls2xlsx(args):
+    output_file_path = args.output or os.path.splitext(args.xls_file)[0] + ".xlsx"
+    status = check_output(output_file_path, args.if_exists)
+    if status is not None:
+        return status
+    xls_to_xlsx(args.xls_file, output_file_path, args.task_stats)
+    print(f"Converted and saved to {output_file_path}")
+    return exit_ok
+
+def run_xlsx2xls(args):
+    output_file_path = args.output or os.path.splitext(args.xlsx_file)[0] + ".xls"
+    status = check_output(output_file_path, args.if_exists)
+    if status is not None:
+        return status
+    xlsx_to_xls(args.xlsx_file, output_file_path, args.task_stats)
+    print(f"Converted and saved to {output_file_path}")
+    return exit_ok
+
+def run_sortmsg(args):
+    output_file_path = args.output or sorted_msg_path(args.msg_file)
+    status = check_output(output_file_path, args.if_exists)
+    if status is not None:
+        return status
+    count = sort_msg(args.msg_file, output_file_path, args.memory * 1024 * 1024, stats=args.task_stats)
+    print(f"Sorted {count} message(s) and saved to {output_file_path}")
+    return exit_ok
+
+def run_mergemsg(args):
+    status = check_output(args.output, args.if_exists)
+    if status is not None:
+        return status
+    count, repeated_ids = merge_msg(args.msg_files, args.output, args.duplicates, args.task_stats)
+    if repeated_ids:
+        print(f"{len(repeated_ids)} message(s) reused an ID and were left out:", sorted(set(repeated_ids)))
+    print(f"Merged {count} message(s) into {args.output}")
+    return exit_ok
+
+def run_filtermsg(args):
+    if not args.ids and not args.ranges:
+        print_error("Give the IDs to keep with --ids or --ranges.")
+        return exit_usage
+    status = check_output(args.output, args.if_exists)
+    if status is not None:
+        return status
+    ids = [int(id) for id in args.ids.split(",") if id.strip()] if args.ids else None
+    ranges = parse_id_ranges(args.ranges) if args.ranges else None
+    count = filter_msg(args.msg_file, args.output, ids, ranges, args.exclude, args.task_stats)
+    print(f"Saved {count} message(s) to {args.output}")
+    return exit_ok
+
+def run_splitmsg(args):
+    ranges = parse_id_ranges(args.ranges)
+    output_file_paths = [split_msg_path(args.msg_file, low, high) for low, high in ranges]
+    for output_file_path in output_file_paths + ([args.rest] if args.rest else []):
+        status = check_output(output_file_path, args.if_exists)
+        if status is not None:
+            return status
+    for output_file_path, count in split_msg(args.msg_file, ranges, output_file_paths, args.rest, args.task_stats):
+        print(f"Saved {count} message(s) to {output_file_path}")
+    return exit_ok
+
+def run_dirinfo(args):
+    if not os.path.isdir(args.directory):
+        print_error(f"Directory '{args.directory}' was not found.")
+        return exit_failed
+    msg_files = sorted(glob.glob(os.path.join(glob.escape(args.directory), "*.msg")))
+    excel_files = sorted(glob.glob(os.path.join(glob.escape(args.directory), "*.xlsx")) + glob.glob(os.path.join(glob.escape(args.directory), "*.xls")))
+    print("Directory:", os.path.abspath(args.directory))
+    print(f"PLU message files ({len(msg_files)}):")
+    for file in msg_files:
+        print(" ", file)
+    print(f"Excel files ({len(excel_files)}):")
+    for file in excel_files:
+        print(" ", file)
+    return exit_ok
+
+def run_patch(args):
+    with stage(args.task_stats, "read") as read:
+        updates = read_message_updates(args.update_file)
+        read.records = len(updates)
+        read.bytes = os.path.getsize(args.update_file)
+    replaced_ids, appended_ids = patch_msg(args.msg_file, updates, args.task_stats)
+    print(f"Replaced {len(replaced_ids)} message(s) and added {len(appended_ids)} new message(s) in {args.msg_file}")
+    return exit_ok
+
+def run_sync(args):
+    source_name, source_extension = os.path.splitext(args.source_file)
+    if source_extension.lower() == ".msg":
+        output_file_path = args.output or source_name + ".xlsx"
+        result = sync_msg_to_xlsx(args.source_file, output_file_path, args.task_stats)
+    elif source_extension.lower() in (".xlsx", ".xls"):
+        output_file_path = args.output or source_name + ".msg"
+        result = sync_xlsx_to_msg(args.source_file, output_file_path, args.duplicates, args.task_stats)
+    else:
+        print_error("File type must be a .msg file or an Excel spreadsheet (.xls or .xlsx)")
+        return exit_failed
+    if result.full_rewrite:
+        print(f"Converted all {len(result.added)} message(s) to {output_file_path}")
+    else:
+        print(f"Synced {output_file_path}: {len(result.added)} added, {len(result.changed)} changed, {len(result.removed)} removed")
+    if result.repeated_ids:
+        print(f"{len(result.repeated_ids)} message(s) reused an ID and were left out:", sorted(set(result.repeated_ids)))
+        if args.duplicates == "report":
+            print(f"The messages that were left out are listed in {duplicate_report_path(output_file_path)}")
+    return exit_ok
+
+def run_batch(args):
+    direction = "msg-to-xlsx" if args.to == "xlsx" else "xlsx-to-msg"
+
+    def print_progress(result, done, total):
+        if result.status == "failed":
+            print(f"[{done}/{total}] FAILED {result.source}: {result.error}")
+        elif result.status == "skipped":
+            print(f"[{done}/{total}] Skipped {result.source} ({result.error or result.output + ' already exists'})")
+        else:
+            print(f"[{done}/{total}] Converted {result.source} to {result.output} ({result.seconds:.1f} s)")
+
+    results = convert_directory(args.directory, direction, args.workers, args.if_exists == "overwrite", not args.no_recursive,
+                                args.merge == "formula", args.duplicates, print_progress)
+    statuses = [result.status for result in results]
+    print(f"Converted {statuses.count('converted')} file(s), skipped {statuses.count('skipped')}, failed {statuses.count('failed')}.")
+    if "failed" in statuses:
+        return exit_failed
+    if args.if_exists == "fail" and any(result.status == "skipped" and result.error is None for result in results):
+        print_error("Some outputs already exist. Use --if-exists overwrite or --if-exists skip.")
+        return exit_output_exists
+    return exit_ok
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--debug", action="store_true", help="show warnings and full error tracebacks")
+    # Only for the commands that time their stages. dirinfo has none, and
+    # batch converts its files in other processes.
+    timed = argparse.ArgumentParser(add_help=False)
+    timed.add_argument("--stats", action="store_true", help="print how long each stage of the task took")
+    timed.add_argument("--trace-memory", action="store_true", help="with --stats, also measure peak memory (makes the task several times slower)")
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("--if-exists", choices=if_exists_policies, default="fail", help="what to do when the output already exists (default: fail)")
+    merge = argparse.ArgumentParser(add_help=False)
+    merge.add_argument("--merge", choices=("standard", "formula"), default="standard", help="merged message column style (default: standard)")
+    duplicates = argparse.ArgumentParser(add_help=False)
+    duplicates.add_argument("--duplicates", choices=duplicate_policies, default="first", help="how to handle messages that reuse an ID (default: first)")
+
+    parser = argparse.ArgumentParser(prog="pmx", description="PLU-Message-Excel File Manager for LP-Works. Run without arguments for the menu.")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    command = commands.add_parser("msg2xlsx", parents=[common, timed, output, merge], help="convert a .msg file to an Excel file")
+    command.add_argument("msg_file")
+    command.add_argument("-o", "--output", help="Excel file to write")
+    command.add_argument("--sort", choices=sort_outputs, default="separate", help="when the IDs are out of order, also save a sorted copy as a separate file (the default) or as a second sheet, or save only the sorted or only the file order")
+    command.add_argument("--no-sorted-copy", action="store_true", help="same as --sort unsorted")
+    command.set_defaults(handler=run_msg2xlsx)
+
+    command = commands.add_parser("xlsx2msg", parents=[common, timed, output, duplicates], help="convert an Excel file to a .msg file")
+    command.add_argument("excel_file")
+    command.add_argument("-o", "--output", help=".msg file to write")
+    command.set_defaults(handler=run_xlsx2msg)
+
+    command = commands.add_parser("append", parents=[common, timed, output], help="append a message Excel file to a PLU Excel file")
+    command.add_argument("plu_file")
+    command.add_argument("msg_file", help="Excel file made from a .msg file")
+    command.add_argument("-o", "--output", help="Excel file to write")
+    command.set_defaults(handler=run_append)
+
+    command = commands.add_parser("gsort", parents=[common, timed, output], help="sort a PLU Excel file by g-code")
+    command.add_argument("plu_file")
+    command.add_argument("-o", "--output", help="Excel file to write")
+    command.set_defaults(handler=run_gsort)
+
+    command = commands.add_parser("xls2xlsx", parents=[common, timed, output], help="convert a .xls file to a .xlsx file")
+    command.add_argument("xls_file")
+    command.add_argument("-o", "--output", help=".xlsx file to write")
+    command.set_defaults(handler=run_xls2xlsx)
+
+    command = commands.add_parser("xlsx2xls", parents=[common, timed, output], help="convert a .xlsx file to a .xls file")
+    command.add_argument("xlsx_file")
+    command.add_argument("-o", "--output", help=".xls file to write")
+    command.set_defaults(handler=run_xlsx2xls)
+
+    command = commands.add_parser("sortmsg", parents=[common, timed, output], help="sort a .msg file by message ID")
+    command.add_argument("msg_file")
+    command.add_argument("-o", "--output", help=".msg file to write (can be msg_file itself with --if-exists overwrite)")
+    command.add_argument("--memory", type=int, default=sort_memory_bytes // (1024 * 1024), help="MB of records to sort in memory at a time; larger files are sorted in runs on disk (default: %(default)s)")
+    command.set_defaults(handler=run_sortmsg)
+
+    command = commands.add_parser("mergemsg", parents=[common, timed, output, duplicates], help="merge .msg files into one")
+    command.add_argument("msg_files", nargs="+", help=".msg files to merge, in order")
+    command.add_argument("-o", "--output", required=True, help=".msg file to write")
+    command.set_defaults(handler=run_mergemsg)
+
+    command = commands.add_parser("filtermsg", parents=[common, timed, output], help="copy the messages with some IDs to a new .msg file")
+    command.add_argument("msg_file")
+    command.add_argument("-o", "--output", required=True, help=".msg file to write")
+    command.add_argument("--ids", help="IDs to keep, like 12,15,300")
+    command.add_argument("--ranges", help="ID ranges to keep, like 1-999,2000-")
+    command.add_argument("--exclude", action="store_true", help="leave the given IDs out and keep the others instead")
+    command.set_defaults(handler=run_filtermsg)
+
+    command = commands.add_parser("splitmsg", parents=[common, timed, output], help="split a .msg file into one file per ID range")
+    command.add_argument("msg_file")
+    command.add_argument("ranges", help="ID ranges that do not overlap, like 1-999,1000-1999,2000-")
+    command.add_argument("--rest", help=".msg file for the messages outside every range (they are left out otherwise)")
+    command.set_defaults(handler=run_splitmsg)
+
+    command = commands.add_parser("dirinfo", parents=[common], help="list the .msg and Excel files in a directory")
+    command.add_argument("directory", nargs="?", default=".")
+    command.set_defaults(handler=run_dirinfo)
+
+    command = commands.add_parser("patch", parents=[common, timed], help="write changed messages from an Excel or CSV file into a .msg file")
+    command.add_argument("msg_file")
+    command.add_argument("update_file")
+    command.set_defaults(handler=run_patch)
+
+    command = commands.add_parser("sync", parents=[common, timed, duplicates], help="sync changes between a .msg file and its Excel file")
+    command.add_argument("source_file", help=".msg or Excel file to sync from")
+    command.add_argument("-o", "--output", help="file to sync to")
+    command.set_defaults(handler=run_sync)
+
+    command = commands.add_parser("batch", parents=[common, output, merge, duplicates], help="convert every .msg or Excel file in a directory")
+    command.add_argument("directory")
+    command.add_argument("--to", choices=("xlsx", "msg"), required=True, help="convert .msg files to xlsx, or Excel files to msg")
+    command.add_argument("--workers", type=int, help="number of files converted at a time (default: number of CPUs)")
+    command.add_argument("--no-recursive", action="store_true", help="leave out subdirectories")
+    command.set_defaults(handler=run_batch)
+
+    return parser
+
+def run_cli(argv=None):
+    args = build_parser().parse_args(argv)
+    if not args.debug:
+        warnings.filterwarnings("ignore", category=DeprecationWarning)
+        warnings.filterwarnings("ignore", category=FutureWarning)
+    args.task_stats = TaskStats(args.command, args.trace_memory) if getattr(args, "stats", False) else None
+    try:
+        return args.handler(args)
+    except Exception as e:
+        if args.debug:
+            raise
+        if isinstance(e, FileNotFoundError):
+            print_error(f"{e.filename} not found.")
+        elif isinstance(e, PermissionError):
+            print_error(f"Permission denied for {e.filename}. Close it if it is open.")
+        elif isinstance(e, DuplicateIdError):
+            print_error(str(e))
+        else:
+            print_error(f"{type(e).__name__}: {e}")
+        return exit_failed
+    finally:
+        if args.task_stats is not None:
+            print(args.task_stats.summary())
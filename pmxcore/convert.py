@@ -0,0 +1,129 @@
+# romero@engineer.com
+
+# Reading and writing whole .msg files and converting them to and from Excel
+# files, without any prompts.
+# These are the steps behind menu options 1 and 2, so batch jobs and scripts
+# produce the same files as the interactive programs.
+
+import os
+from collections import namedtuple
+
+from .duplicates import duplicate_report_path, resolve_duplicates, write_duplicate_report
+from .excel import close_message_workbook, export_messages_to_excel, message_workbook, write_message_sheet
+from .index import IdOrderCheck
+from .journal import discard_journal, recover_msg
+from .msgops import iter_records
+from .patch import read_message_updates
+from .records import iter_messages, message_chunk_bytes, read_messages, write_messages
+from .stats import stage
+
+# How msg_to_xlsx() saves a .msg file whose IDs are out of order:
+#   "separate"  the messages in file order, and a "<name> sorted.xlsx" file
+#               with them sorted by ID
+#   "both"      one workbook with a "Messages" sheet in file order and a
+#               "Sorted by ID" sheet
+#   "sorted"    only the messages sorted by ID
+#   "unsorted"  only the messages in file order
+# A file that is already sorted is always saved as a single sheet.
+sort_outputs = ("separate", "both", "sorted", "unsorted")
+file_order_sheet_name = "Messages"
+sorted_sheet_name = "Sorted by ID"
+
+# written is the list of files saved. is_sorted tells whether the IDs in the
+# .msg file were already in order, and duplicate_ids lists the IDs it uses
+# more than once.
+MsgExport = namedtuple("MsgExport", ["written", "is_sorted", "duplicate_ids"])
+
+def read_msg(msg_file_path):
+    recover_msg(msg_file_path)
+    with open(msg_file_path, 'rb') as file:
+        return read_messages(file)
+
+# IDs must already be in the 1 to 4294967295 range and unique (see
+# resolve_duplicates()). Returns the number of messages written.
+def write_msg(msg_file_path, messages):
+    discard_journal(msg_file_path)
+    with open(msg_file_path, 'wb') as file:
+        return write_messages(file, messages)
+
+def sorted_xlsx_path(xlsx_file_path):
+    return os.path.splitext(xlsx_file_path)[0] + " sorted.xlsx"
+
+# Messages that share an ID keep their order from the file
+def messages_sorted_by_id(msg_file_path, stats=None):
+    from .table import MessageTable
+
+    with stage(stats, "sort") as sort:
+        sorted_messages = MessageTable.read(msg_file_path).sort_by_id()
+        sort.records = len(sorted_messages)
+        sort.bytes = len(sorted_messages) * message_chunk_bytes
+    return sorted_messages
+
+# Writes the .msg file to xlsx_file_path (by default the same-named .xlsx file
+# next to it), laid out by sort_output (see sort_outputs). The IDs are checked
+# while the file is decoded for the first sheet, so the messages are only
+# written out once more when they are not in order. on_merged is passed on to
+# write_message_sheet(). stats is an optional TaskStats that the stages are
+# timed into. Returns a MsgExport.
+def msg_to_xlsx(msg_file_path, xlsx_file_path=None, alt_merge_mode=False, sort_output="separate", on_merged=None, stats=None):
+    # True and False are what sort_output was before it had modes
+    if sort_output is True or sort_output is False:
+        sort_output = "separate" if sort_output else "unsorted"
+    if sort_output not in sort_outputs:
+        raise ValueError(f"Unknown sort output '{sort_output}'. Use one of: {', '.join(sort_outputs)}")
+    if xlsx_file_path is None:
+        xlsx_file_path = os.path.splitext(msg_file_path)[0] + ".xlsx"
+    written = [xlsx_file_path]
+    recover_msg(msg_file_path)
+
+    if sort_output == "sorted":
+        # Only the IDs are looked at here, to find out if the file can be
+        # streamed as it is. The records are the ones read_messages() keeps.
+        order = IdOrderCheck()
+        with stage(stats, "sort check") as check:
+            for id, _ in iter_records(msg_file_path):
+                order.add(id)
+            check.records = order.count
+        workbook = message_workbook(xlsx_file_path)
+        if order.is_sorted:
+            with open(msg_file_path, 'rb') as file:
+                write_message_sheet(workbook, iter_messages(file, stats=stats), None, alt_merge_mode, on_merged, stats)
+        else:
+            write_message_sheet(workbook, messages_sorted_by_id(msg_file_path, stats), None, alt_merge_mode, on_merged, stats)
+        close_message_workbook(workbook, stats)
+        return MsgExport(written, order.is_sorted, sorted(order.duplicate_ids))
+
+    order = IdOrderCheck()
+    workbook = message_workbook(xlsx_file_path)
+    with open(msg_file_path, 'rb') as file:
+        sheet_name = file_order_sheet_name if sort_output == "both" else None
+        write_message_sheet(workbook, order.watch(iter_messages(file, stats=stats)), sheet_name, alt_merge_mode, on_merged, stats)
+    if not order.is_sorted and sort_output == "both":
+        write_message_sheet(workbook, messages_sorted_by_id(msg_file_path, stats), sorted_sheet_name, alt_merge_mode, on_merged, stats)
+    close_message_workbook(workbook, stats)
+
+    if not order.is_sorted and sort_output == "separate":
+        export_messages_to_excel(messages_sorted_by_id(msg_file_path, stats), sorted_xlsx_path(xlsx_file_path), alt_merge_mode, on_merged, stats)
+        written.append(sorted_xlsx_path(xlsx_file_path))
+    return MsgExport(written, order.is_sorted, sorted(order.duplicate_ids))
+
+# Writes an Excel (or CSV) file with ID and M1 - M8 columns to msg_file_path
+# (by default the same-named .msg file next to it). Reused IDs are handled by
+# duplicate_policy, and the "report" policy saves the messages left out next
+# to the output. Returns (messages written, messages left out).
+def xlsx_to_msg(excel_file_path, msg_file_path=None, duplicate_policy="first", stats=None):
+    if msg_file_path is None:
+        msg_file_path = os.path.splitext(excel_file_path)[0] + ".msg"
+
+    with stage(stats, "read") as read:
+        updates = read_message_updates(excel_file_path)
+        read.records = len(updates)
+        read.bytes = os.path.getsize(excel_file_path)
+    with stage(stats, "duplicates", len(updates)):
+        messages, repeated = resolve_duplicates(updates, duplicate_policy)
+    with stage(stats, "write") as write:
+        write.records = write_msg(msg_file_path, messages)
+        write.bytes = write.records * message_chunk_bytes
+    if repeated and duplicate_policy == "report":
+        write_duplicate_report(duplicate_report_path(msg_file_path), repeated)
+    return messages, repeated
@@ -0,0 +1,62 @@
+# romero@engineer.com
+
+# Handling of messages that reuse an ID when writing a .msg file.
+#
+# LP-Works expects every message ID in a .msg file to be unique, so only one
+# message per ID is written. The policy decides which one:
+#   first:  Keep the first message with each ID (what older versions did)
+#   last:   Keep the last message with each ID, in the place of the first
+#   error:  Raise DuplicateIdError and write nothing
+#   report: Keep the first message with each ID and save the others to a
+#           report file next to the output
+
+import csv
+
+from .records import message_line_names
+
+duplicate_policies = ("first", "last", "error", "report")
+
+class DuplicateIdError(ValueError):
+    def __init__(self, repeat_ids):
+        self.repeat_ids = repeat_ids
+        super().__init__(f"{len(repeat_ids)} message(s) reuse an ID: {repeat_ids}")
+
+# IDs are stored in 4 bytes and 0 is not a valid ID
+def clamp_message_id(id):
+    if id > 4294967295:
+        return 4294967295
+    elif id < 1:
+        return 1
+    return id
+
+# Returns (messages to write, messages left out). IDs are clamped first, so
+# two IDs that clamp to the same value count as a duplicate.
+def resolve_duplicates(messages, policy="first"):
+    if policy not in duplicate_policies:
+        raise ValueError(f"Unknown duplicate ID policy '{policy}'. Use one of: {', '.join(duplicate_policies)}")
+
+    kept = {}
+    repeated = []
+    for message in messages:
+        message.id = clamp_message_id(message.id)
+        if message.id not in kept:
+            kept[message.id] = message
+        elif policy == "last":
+            repeated.append(kept[message.id])
+            kept[message.id] = message
+        else:
+            repeated.append(message)
+
+    if repeated and policy == "error":
+        raise DuplicateIdError(sorted({message.id for message in repeated}))
+    return list(kept.values()), repeated
+
+def duplicate_report_path(output_file_path):
+    return output_file_path.rsplit(".", 1)[0] + " duplicates.csv"
+
+def write_duplicate_report(report_file_path, repeated):
+    with open(report_file_path, 'w', newline='', encoding="utf-8-sig") as file:
+        writer = csv.writer(file)
+        writer.writerow(["ID", *message_line_names])
+        for message in repeated:
+            writer.writerow([message.id, *[getattr(message, name) for name in message_line_names]])
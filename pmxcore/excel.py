@@ -0,0 +1,86 @@
+# romero@engineer.com
+
+# Excel output for decoded messages.
+
+import time
+
+from .records import merged_columns
+from .stats import stage
+
+message_sheet_header = ["ID", "M1", "M2", "M3", "M4", "M5", "M6", "M7", "M8", "Merged", "Merged with Spaces", "Merged with Newlines"]
+
+# With constant_memory, each row is flushed to a temporary file as soon as the
+# next one starts, so memory use stays flat however many messages there are
+# (xlsxwriter then stores the text in the cells instead of a shared string
+# table, which makes files with many repeated lines a little bigger). Sheets
+# are written one after the other, each in row order.
+def message_workbook(file_path, constant_memory=True):
+    import xlsxwriter
+
+    return xlsxwriter.Workbook(file_path, {'constant_memory': constant_memory})
+
+def close_message_workbook(workbook, stats=None):
+    with stage(stats, "write"):
+        workbook.close()
+
+# Adds a sheet with one row per message. messages can be any iterable,
+# including the iter_messages() stream, and is only walked once. With stats,
+# building the merged columns is timed as the "merge" stage and writing the
+# cells as the "write" stage. on_merged, if given, is called as
+# on_merged(message, merged columns) for each message once its merged columns
+# are built (standard mode only), so a front end can show them.
+def write_message_sheet(workbook, messages, sheet_name=None, alt_merge_mode=False, on_merged=None, stats=None):
+    worksheet = workbook.add_worksheet(sheet_name)
+    text_wrap_format = workbook.add_format({'text_wrap': True})
+    worksheet.write_row(0, 0, message_sheet_header)
+
+    if alt_merge_mode:
+        # The merged columns are formulas over B - I, written once per row with
+        # the text they work out to as the cached result. xlsxwriter marks every
+        # workbook for a full recalculation on load (fullCalcOnLoad), which
+        # would throw those results away, so that is turned off and
+        # calculation stays automatic for later edits. Excel can still
+        # recalculate on open when the file's calcId is older than its own
+        # calculation engine.
+        workbook.calc_on_load = False
+        for row, message in enumerate(messages):
+            started = time.perf_counter()
+            lines = [message.M1, message.M2, message.M3, message.M4, message.M5, message.M6, message.M7, message.M8]
+            worksheet.write(row + 1, 0, message.id)
+            worksheet.write_row(row + 1, 1, lines, text_wrap_format)
+
+            # Merged in column J (Alternative methods)
+            formula_j = '=B{row_num} & C{row_num} & D{row_num} & E{row_num} & F{row_num} & G{row_num} & H{row_num} & I{row_num}'.format(row_num=row + 2)
+            #formula_j = '=CONCAT(B{row_num},C{row_num},D{row_num},E{row_num},F{row_num},G{row_num},H{row_num},I{row_num})'.format(row_num=row + 2)
+            worksheet.write_formula(row + 1, 9, formula_j, text_wrap_format, "".join(lines))
+
+            # Merged with Spaces in column K (Alternative methods)
+            formula_k = '=B{row_num} & " " & C{row_num} & " " & D{row_num} & " " & E{row_num} & " " & F{row_num} & " " & G{row_num} & " " & H{row_num} & " " & I{row_num}'.format(row_num=row + 2)
+            #formula_k = '=CONCAT(B{row_num}," ",C{row_num}," ",D{row_num}," ",E{row_num}," ",F{row_num}," ",G{row_num}," ",H{row_num}," ",I{row_num})'.format(row_num=row + 2)
+            worksheet.write_formula(row + 1, 10, formula_k, text_wrap_format, " ".join(lines))
+
+            # Merged with Newlines in column L (Alternative methods)
+            formula_l = '=B{row_num} & CHAR(10) & C{row_num} & CHAR(10) & D{row_num} & CHAR(10) & E{row_num} & CHAR(10) & F{row_num} & CHAR(10) & G{row_num} & CHAR(10) & H{row_num} & CHAR(10) & I{row_num}'.format(row_num=row + 2)
+            #formula_l = '=CONCAT(B{row_num},CHAR(10),C{row_num},CHAR(10),D{row_num},CHAR(10),E{row_num},CHAR(10),F{row_num},CHAR(10),G{row_num},CHAR(10),H{row_num},CHAR(10),I{row_num})'.format(row_num=row + 2)
+            worksheet.write_formula(row + 1, 11, formula_l, text_wrap_format, "\n".join(lines))
+            if stats is not None:
+                stats.add("write", time.perf_counter() - started, 1)
+    else:
+        for row, message in enumerate(messages):
+            started = time.perf_counter()
+            lines = [message.M1, message.M2, message.M3, message.M4, message.M5, message.M6, message.M7, message.M8]
+            merged = merged_columns(lines)
+            merged_at = time.perf_counter()
+            if on_merged is not None:
+                on_merged(message, merged)
+            worksheet.write(row + 1, 0, message.id)
+            worksheet.write_row(row + 1, 1, [*lines, *merged], text_wrap_format)
+            if stats is not None:
+                stats.add("merge", merged_at - started, 1)
+                stats.add("write", time.perf_counter() - merged_at, 1)
+    return worksheet
+
+def export_messages_to_excel(messages, file_path, alt_merge_mode=False, on_merged=None, stats=None, constant_memory=True):
+    workbook = message_workbook(file_path, constant_memory)
+    write_message_sheet(workbook, messages, None, alt_merge_mode, on_merged, stats)
+    close_message_workbook(workbook, stats)
@@ -0,0 +1,148 @@
+# romero@engineer.com
+
+# ID to record offset index for .msg files.
+#
+#   index = MsgIndex.open("file.msg")    # Loads "file.msg.idx" or builds it
+#   with MsgReader("file.msg") as reader:
+#       message = reader.get(1234, index)
+#
+# Building the index reads only the 4 ID bytes of each record, never the
+# message text. The sidecar file stores the size and modification time of
+# the .msg file it was built from, and is ignored once the file changes.
+
+import json
+import mmap
+import os
+import struct
+
+from .records import message_chunk_bytes
+
+index_extension = ".idx"
+index_version = 1
+
+# The ID followed by the rest of the record, which is skipped
+id_scan_struct = struct.Struct("<I%dx" % (message_chunk_bytes - 4))
+
+def index_path_for(msg_file_path):
+    return str(msg_file_path) + index_extension
+
+def scan_ids(buffer):
+    full_bytes = len(buffer) - (len(buffer) % message_chunk_bytes)
+    return [id for (id,) in id_scan_struct.iter_unpack(memoryview(buffer)[:full_bytes])]
+
+class MsgIndex:
+    def __init__(self, ids, size=None, mtime_ns=None):
+        self.ids = ids
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.offsets = {}     # ID -> offset of its first record
+        self.duplicates = {}  # ID -> offsets of every record that uses it
+        self.is_sorted = True
+
+        previous_id = None
+        for record_number, id in enumerate(ids):
+            offset = record_number * message_chunk_bytes
+            if id in self.offsets:
+                self.duplicates.setdefault(id, [self.offsets[id]]).append(offset)
+            else:
+                self.offsets[id] = offset
+            if previous_id is not None and id < previous_id:
+                self.is_sorted = False
+            previous_id = id
+
+    @classmethod
+    def build(cls, msg_file_path):
+        with open(msg_file_path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            if stat.st_size == 0:
+                return cls([], stat.st_size, stat.st_mtime_ns)
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                ids = scan_ids(buffer)
+        return cls(ids, stat.st_size, stat.st_mtime_ns)
+
+    # Returns None if there is no sidecar, or it is out of date or not a
+    # valid index
+    @classmethod
+    def load(cls, msg_file_path, index_file_path=None):
+        index_file_path = index_file_path or index_path_for(msg_file_path)
+        try:
+            with open(index_file_path, 'r') as file:
+                data = json.load(file)
+            if data.get("version") != index_version:
+                return None
+            ids, size, mtime_ns = data["ids"], data["size"], data["mtime_ns"]
+        except (FileNotFoundError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+        if not (isinstance(ids, list) and all(type(id) is int for id in ids) and type(size) is int and type(mtime_ns) is int):
+            return None
+        index = cls(ids, size, mtime_ns)
+        if not index.is_current(msg_file_path):
+            return None
+        return index
+
+    @classmethod
+    def open(cls, msg_file_path, index_file_path=None, save=True):
+        index = cls.load(msg_file_path, index_file_path)
+        if index is None:
+            index = cls.build(msg_file_path)
+            if save:
+                index.save(msg_file_path, index_file_path)
+        return index
+
+    def save(self, msg_file_path, index_file_path=None):
+        index_file_path = index_file_path or index_path_for(msg_file_path)
+        temp_file_path = index_file_path + ".tmp"
+        with open(temp_file_path, 'w') as file:
+            json.dump({"version": index_version, "size": self.size, "mtime_ns": self.mtime_ns, "ids": self.ids}, file)
+        os.replace(temp_file_path, index_file_path)
+
+    def is_current(self, msg_file_path):
+        try:
+            stat = os.stat(msg_file_path)
+        except FileNotFoundError:
+            return False
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+    def offset(self, id):
+        return self.offsets.get(id)
+
+    def record_number(self, id):
+        offset = self.offsets.get(id)
+        return None if offset is None else offset // message_chunk_bytes
+
+    def __contains__(self, id):
+        return id in self.offsets
+
+    def __len__(self):
+        return len(self.ids)
+
+# Checks the IDs of a message stream while it is being read, so the file does
+# not need a second pass to find out whether it is sorted. IDs count as sorted
+# when each one is at least the one before it, the same as MsgIndex.is_sorted.
+# IDs used more than once are collected in duplicate_ids either way.
+#
+#   order = IdOrderCheck()
+#   export_messages_to_excel(order.watch(iter_messages(file)), "file.xlsx")
+#   if not order.is_sorted: ...
+class IdOrderCheck:
+    def __init__(self):
+        self.is_sorted = True
+        self.duplicate_ids = set()
+        self.count = 0
+        self._seen_ids = set()
+        self._previous_id = None
+
+    def add(self, id):
+        if id in self._seen_ids:
+            self.duplicate_ids.add(id)
+        else:
+            self._seen_ids.add(id)
+        if self._previous_id is not None and id < self._previous_id:
+            self.is_sorted = False
+        self._previous_id = id
+        self.count += 1
+
+    def watch(self, messages):
+        for message in messages:
+            self.add(message.id)
+            yield message
@@ -0,0 +1,122 @@
+# romero@engineer.com
+
+# The undo journal of patch_msg().
+#
+# Before a patch touches a .msg file, the original bytes of every range it
+# will overwrite are saved to "<file>.pmxjournal" along with the bytes the
+# patch will write there, and the file sizes before, during and after the
+# patch. The journal is removed once the patch is on disk. If it is still
+# there, the patch was cut off, and recover_msg() puts the original bytes
+# back.
+#
+# A journal is only used while the file still looks like that patch left it:
+# every range holds the original bytes, the new bytes, or new bytes followed
+# by the rest of the original ones (a write that was cut off), and the size is
+# one the patch could have left. A file that was written again by anything
+# else does not match, and its journal is dropped instead of being applied.
+# The functions that replace a whole .msg file call discard_journal() first.
+
+import os
+import struct
+
+journal_extension = ".pmxjournal"
+journal_magic = b"PMXJ"
+journal_version = 2
+# Magic, version, original size, size the file is cut to before new records
+# are added, size after the patch and number of saved ranges. Then for each
+# range its offset and length followed by the original bytes and the bytes
+# the patch writes there (as many as there are original bytes).
+journal_header_struct = struct.Struct("<4sHQQQI")
+journal_range_struct = struct.Struct("<QI")
+
+class Journal:
+    def __init__(self, size, cut_size, patched_size, ranges):
+        self.size = size
+        self.cut_size = cut_size
+        self.patched_size = patched_size
+        self.ranges = ranges  # (offset, original bytes, new bytes)
+
+    # True if the file can only be in this state because of the patch
+    # the journal was written for
+    def matches(self, file):
+        file_size = os.fstat(file.fileno()).st_size
+        if file_size != self.size and not self.cut_size <= file_size <= self.patched_size:
+            return False
+        for offset, original, new in self.ranges:
+            file.seek(offset)
+            current = file.read(len(original))
+            # Only a range that ran to the end of the file can be cut short
+            if len(current) < len(original) and offset + len(original) != self.size:
+                return False
+            if current == original or current == new:
+                continue
+            written = 0
+            while written < len(current) and current[written] == new[written]:
+                written += 1
+            if current[written:] != original[written:len(current)]:
+                return False
+        return True
+
+def journal_path_for(msg_file_path):
+    return str(msg_file_path) + journal_extension
+
+# Returns a Journal, or None if it was not written out in full (in that case
+# the .msg file was never touched) or is not a journal this version wrote
+def read_journal(journal_file_path):
+    with open(journal_file_path, 'rb') as file:
+        data = file.read()
+    if len(data) < journal_header_struct.size:
+        return None
+    magic, version, size, cut_size, patched_size, count = journal_header_struct.unpack_from(data)
+    if magic != journal_magic or version != journal_version:
+        return None
+    ranges = []
+    position = journal_header_struct.size
+    for _ in range(count):
+        if position + journal_range_struct.size > len(data):
+            return None
+        offset, length = journal_range_struct.unpack_from(data, position)
+        position += journal_range_struct.size
+        if position + 2 * length > len(data):
+            return None
+        ranges.append((offset, data[position:position + length], data[position + length:position + 2 * length]))
+        position += 2 * length
+    return Journal(size, cut_size, patched_size, ranges)
+
+def write_journal(journal_file_path, journal):
+    with open(journal_file_path, 'wb') as file:
+        file.write(journal_header_struct.pack(journal_magic, journal_version, journal.size, journal.cut_size, journal.patched_size, len(journal.ranges)))
+        for offset, original, new in journal.ranges:
+            file.write(journal_range_struct.pack(offset, len(original)))
+            file.write(original)
+            file.write(new[:len(original)].ljust(len(original), b'\x00'))
+        file.flush()
+        os.fsync(file.fileno())
+
+# Undoes a patch that was cut off part way through, using its journal.
+# Returns True if the file was restored.
+def recover_msg(msg_file_path):
+    journal_file_path = journal_path_for(msg_file_path)
+    if not os.path.exists(journal_file_path):
+        return False
+    journal = read_journal(journal_file_path)
+    restored = False
+    if journal is not None and os.path.exists(msg_file_path):
+        with open(msg_file_path, 'r+b') as file:
+            if journal.matches(file):
+                for offset, original, _ in journal.ranges:
+                    file.seek(offset)
+                    file.write(original)
+                file.truncate(journal.size)
+                file.flush()
+                os.fsync(file.fileno())
+                restored = True
+    os.remove(journal_file_path)
+    return restored
+
+# Called before a .msg file is replaced as a whole, which makes the journal
+# of an earlier patch meaningless
+def discard_journal(msg_file_path):
+    journal_file_path = journal_path_for(msg_file_path)
+    if os.path.exists(journal_file_path):
+        os.remove(journal_file_path)
@@ -0,0 +1,332 @@
+# romero@engineer.com
+
+# .msg file operations that work on the 412-byte records as they are, without
+# decoding any message text, so they run at about the speed of the disk.
+#
+#   sort_msg("PLU.msg")                  # Saves "PLU sorted.msg"
+#   merge_msg(["a.msg", "b.msg"], "all.msg", duplicate_policy="last")
+#   filter_msg("PLU.msg", "some.msg", ranges=parse_id_ranges("100-199, 250"))
+#   split_msg("PLU.msg", parse_id_ranges("1-999, 1000-1999"))
+#
+# Records are read the same way as read_messages(): a trailing partial record
+# keeps the lines that were read in full, and the last record is dropped if
+# its ID is 0. Outputs are written to a temporary file that replaces the
+# output in one step, so an output can be the same file as an input.
+
+import bisect
+import heapq
+import os
+import shutil
+import tempfile
+from contextlib import ExitStack, contextmanager
+from operator import itemgetter
+
+from .duplicates import DuplicateIdError, duplicate_policies, duplicate_report_path, write_duplicate_report
+from .journal import discard_journal, recover_msg
+from .records import complete_partial_record, decode_message, id_struct, message_chunk_bytes
+from .stats import stage
+
+# Files up to this size are sorted in memory. Larger files are sorted in runs
+# of this size that are saved to temporary files and merged.
+sort_memory_bytes = 256 * 1024 * 1024
+
+record_id = itemgetter(0)
+
+# Yields (ID, record bytes) for each record of a .msg file. source is a path
+# or a binary file-like object.
+def iter_records(source, chunk_records=4096):
+    if isinstance(source, (str, os.PathLike)):
+        recover_msg(source)
+        with open(source, 'rb') as file:
+            yield from iter_records(file, chunk_records)
+        return
+
+    chunk_bytes = chunk_records * message_chunk_bytes
+    pending = b""
+    previous = None  # Held back until we know whether it is the last record
+    while True:
+        data = source.read(chunk_bytes)
+        if not data:
+            break
+        if pending:
+            data = pending + data
+        full_bytes = len(data) - (len(data) % message_chunk_bytes)
+        pending = data[full_bytes:]
+        for offset in range(0, full_bytes, message_chunk_bytes):
+            if previous is not None:
+                yield previous
+            record = data[offset:offset + message_chunk_bytes]
+            previous = (id_struct.unpack_from(record)[0], record)
+
+    # The last record in a file is only kept if it has a valid ID
+    if pending:
+        if previous is not None:
+            yield previous
+        record = complete_partial_record(pending)
+        if record is not None and id_struct.unpack_from(record)[0] > 0:
+            yield (id_struct.unpack_from(record)[0], record)
+    elif previous is not None and previous[0] > 0:
+        yield previous
+
+# Writes (ID, record bytes) pairs batch_records at a time. Returns the number
+# of records written.
+def write_records(file, records, batch_records=4096):
+    batch = []
+    count = 0
+    for _, record in records:
+        batch.append(record)
+        if len(batch) == batch_records:
+            file.write(b"".join(batch))
+            count += len(batch)
+            batch.clear()
+    if batch:
+        file.write(b"".join(batch))
+        count += len(batch)
+    return count
+
+# The umask can only be read by setting it, so it is set back right away
+def current_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+# Opens a temporary file next to output_file_path that replaces it once the
+# block finishes without an error
+@contextmanager
+def replacing_output(output_file_path):
+    directory = os.path.dirname(os.path.abspath(output_file_path))
+    temp_fd, temp_file_path = tempfile.mkstemp(suffix=".msg.tmp", dir=directory)
+    try:
+        with os.fdopen(temp_fd, 'wb') as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(output_file_path):
+            shutil.copymode(output_file_path, temp_file_path)
+        else:
+            # mkstemp() makes the file readable only by its owner. A new
+            # output gets the mode open() would have given it.
+            os.chmod(temp_file_path, 0o666 & ~current_umask())
+        discard_journal(output_file_path)
+        os.replace(temp_file_path, output_file_path)
+    except BaseException:
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+        raise
+
+def sorted_msg_path(msg_file_path):
+    return os.path.splitext(msg_file_path)[0] + " sorted.msg"
+
+# Runs are only ever whole records, so they are read back without the
+# last-record rules of iter_records()
+def read_run(file, chunk_records=4096):
+    chunk_bytes = chunk_records * message_chunk_bytes
+    while True:
+        data = file.read(chunk_bytes)
+        if not data:
+            return
+        for offset in range(0, len(data), message_chunk_bytes):
+            record = data[offset:offset + message_chunk_bytes]
+            yield (id_struct.unpack_from(record)[0], record)
+
+def write_run(run_directory, run_number, records):
+    records.sort(key=record_id)
+    run_file_path = os.path.join(run_directory, f"run{run_number}.msg")
+    with open(run_file_path, 'wb') as file:
+        write_records(file, records)
+    return run_file_path
+
+# Sorts the records of a .msg file by ID into output_file_path (by default
+# "<name> sorted.msg" next to it). The sort is stable, so messages that share
+# an ID keep their order. Files larger than memory_bytes are sorted in runs
+# that are saved to temp_directory (the system default if None) and merged.
+# Returns the number of records written.
+def sort_msg(msg_file_path, output_file_path=None, memory_bytes=sort_memory_bytes, temp_directory=None, stats=None):
+    if output_file_path is None:
+        output_file_path = sorted_msg_path(msg_file_path)
+    recover_msg(msg_file_path)
+
+    if os.path.getsize(msg_file_path) <= memory_bytes:
+        with stage(stats, "read") as read:
+            records = list(iter_records(msg_file_path))
+            read.records = len(records)
+            read.bytes = os.path.getsize(msg_file_path)
+        with stage(stats, "sort", len(records)):
+            records.sort(key=record_id)
+        with stage(stats, "write", len(records), len(records) * message_chunk_bytes):
+            with replacing_output(output_file_path) as output:
+                return write_records(output, records)
+
+    run_records = max(1, memory_bytes // message_chunk_bytes)
+    with tempfile.TemporaryDirectory(prefix="pmx-sort-", dir=temp_directory) as run_directory:
+        run_file_paths = []
+        with stage(stats, "sort runs") as runs:
+            records = []
+            for record in iter_records(msg_file_path):
+                records.append(record)
+                if len(records) == run_records:
+                    run_file_paths.append(write_run(run_directory, len(run_file_paths), records))
+                    runs.records += len(records)
+                    records = []
+            if records:
+                run_file_paths.append(write_run(run_directory, len(run_file_paths), records))
+                runs.records += len(records)
+            runs.bytes = runs.records * message_chunk_bytes
+
+        # heapq.merge takes equal IDs from the earlier run first, which keeps
+        # the sort stable
+        with stage(stats, "merge", runs.records, runs.bytes):
+            run_files = [open(run_file_path, 'rb') for run_file_path in run_file_paths]
+            try:
+                with replacing_output(output_file_path) as output:
+                    return write_records(output, heapq.merge(*[read_run(run_file) for run_file in run_files], key=record_id))
+            finally:
+                for run_file in run_files:
+                    run_file.close()
+
+# Copies the records of every file into output_file_path, file by file. An ID
+# used more than once is handled by duplicate_policy, as in
+# resolve_duplicates(). Only "last" has to hold records in memory, one per ID;
+# the other policies keep just the IDs. Returns (records written, IDs of the
+# records left out).
+def merge_msg(msg_file_paths, output_file_path, duplicate_policy="first", stats=None):
+    if duplicate_policy not in duplicate_policies:
+        raise ValueError(f"Unknown duplicate ID policy '{duplicate_policy}'. Use one of: {', '.join(duplicate_policies)}")
+
+    repeated = []
+    with stage(stats, "merge") as merge, replacing_output(output_file_path) as output:
+        if duplicate_policy == "last":
+            # The last record with each ID takes the place of the first
+            kept = {}
+            for msg_file_path in msg_file_paths:
+                for id, record in iter_records(msg_file_path):
+                    if id in kept:
+                        repeated.append((id, kept[id]))
+                    kept[id] = record
+            merge.records = write_records(output, kept.items())
+        else:
+            seen_ids = set()
+
+            def first_records():
+                for msg_file_path in msg_file_paths:
+                    for id, record in iter_records(msg_file_path):
+                        if id in seen_ids:
+                            repeated.append((id, record))
+                        else:
+                            seen_ids.add(id)
+                            yield id, record
+
+            merge.records = write_records(output, first_records())
+            if repeated and duplicate_policy == "error":
+                raise DuplicateIdError(sorted({id for id, _ in repeated}))
+        merge.bytes = merge.records * message_chunk_bytes
+
+    if repeated and duplicate_policy == "report":
+        write_duplicate_report(duplicate_report_path(output_file_path), [decode_message(record) for _, record in repeated])
+    return merge.records, [id for id, _ in repeated]
+
+# Reads ID ranges like "1-999, 1000-1999, 2500, 3000-". A single ID is a
+# range of one, and a range without an end is open on that side. Returns a
+# list of (low, high) pairs, with None for an open end.
+def parse_id_ranges(text):
+    ranges = []
+    for part in text.replace(";", ",").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            low, high = (end.strip() for end in part.split("-", 1))
+            ranges.append((int(low) if low else None, int(high) if high else None))
+        else:
+            ranges.append((int(part), int(part)))
+    if not ranges:
+        raise ValueError(f"No ID ranges in '{text}'")
+    return ranges
+
+def format_id_range(low, high):
+    if low == high:
+        return str(low)
+    return f"{'' if low is None else low}-{'' if high is None else high}"
+
+# Finds which of a list of ID ranges an ID is in, with a binary search on
+# the sorted ranges. With merge_overlaps, ranges that overlap are joined;
+# otherwise overlapping ranges raise ValueError.
+class IdRanges:
+    def __init__(self, ranges, merge_overlaps=False):
+        ranges = list(ranges)
+        self.ranges = []  # (low, high, position in ranges), sorted by low
+        closed_ranges = [(0 if low is None else low, 4294967295 if high is None else high, number) for number, (low, high) in enumerate(ranges)]
+        for low, high, number in sorted(closed_ranges):
+            if low > high:
+                raise ValueError(f"ID range {format_id_range(*ranges[number])} ends before it starts")
+            if self.ranges and low <= self.ranges[-1][1]:
+                if not merge_overlaps:
+                    raise ValueError(f"ID ranges {format_id_range(*ranges[self.ranges[-1][2]])} and {format_id_range(*ranges[number])} overlap")
+                last_low, last_high, last_number = self.ranges[-1]
+                self.ranges[-1] = (last_low, max(high, last_high), last_number)
+            else:
+                self.ranges.append((low, high, number))
+        self.lows = [low for low, _, _ in self.ranges]
+
+    # Position in the given ranges of the range that holds id, or None
+    def find(self, id):
+        position = bisect.bisect_right(self.lows, id) - 1
+        if position >= 0 and id <= self.ranges[position][1]:
+            return self.ranges[position][2]
+        return None
+
+    def __contains__(self, id):
+        return self.find(id) is not None
+
+# Copies the records whose ID is in ids or in one of ranges (see
+# parse_id_ranges()) to output_file_path, keeping their order. With exclude,
+# those records are left out and the others are copied instead. Returns the
+# number of records written.
+def filter_msg(msg_file_path, output_file_path, ids=None, ranges=None, exclude=False, stats=None):
+    ids = set(ids or ())
+    id_ranges = IdRanges(ranges or (), merge_overlaps=True)
+    with stage(stats, "filter") as filter_stage, replacing_output(output_file_path) as output:
+        filter_stage.records = write_records(output, ((id, record) for id, record in iter_records(msg_file_path) if ((id in ids or id in id_ranges) != exclude)))
+        filter_stage.bytes = filter_stage.records * message_chunk_bytes
+    return filter_stage.records
+
+def split_msg_path(msg_file_path, low, high):
+    return f"{os.path.splitext(msg_file_path)[0]} {format_id_range(low, high)}.msg"
+
+# Writes the records of each ID range to its own file in one pass, keeping
+# their order. The ranges must not overlap. Records outside every range go to
+# rest_file_path, or are left out if it is None. output_file_paths defaults to
+# "<name> <range>.msg" next to the file. Returns [(path, records written)] in
+# the order of ranges, followed by the rest file if there is one.
+def split_msg(msg_file_path, ranges, output_file_paths=None, rest_file_path=None, stats=None):
+    ranges = list(ranges)
+    if output_file_paths is None:
+        output_file_paths = [split_msg_path(msg_file_path, low, high) for low, high in ranges]
+    if len(output_file_paths) != len(ranges):
+        raise ValueError("Give one output file for each ID range")
+    id_ranges = IdRanges(ranges)
+    if rest_file_path:
+        output_file_paths = [*output_file_paths, rest_file_path]
+    rest_number = len(ranges) if rest_file_path else None
+
+    counts = [0] * len(output_file_paths)
+    batches = [[] for _ in output_file_paths]
+    with stage(stats, "split") as split, ExitStack() as stack:
+        outputs = [stack.enter_context(replacing_output(path)) for path in output_file_paths]
+        for id, record in iter_records(msg_file_path):
+            number = id_ranges.find(id)
+            if number is None:
+                number = rest_number
+                if number is None:
+                    continue
+            batch = batches[number]
+            batch.append(record)
+            counts[number] += 1
+            if len(batch) == 4096:
+                outputs[number].write(b"".join(batch))
+                batch.clear()
+        for output, batch in zip(outputs, batches):
+            output.write(b"".join(batch))
+        split.records = sum(counts)
+        split.bytes = split.records * message_chunk_bytes
+    return list(zip(output_file_paths, counts))
@@ -0,0 +1,106 @@
+# romero@engineer.com
+
+# Updating a few messages of a .msg file without converting the whole file.
+#
+# Records are a fixed 412 bytes, so a changed message is written over its old
+# record in place and a message with a new ID is added to the end. Only the
+# changed messages are encoded, and the rest of the file is not copied or
+# rewritten.
+#
+# Before the file is touched, the original bytes of every record that will be
+# overwritten, and what will be written over them, are saved to a journal
+# next to it ("<file>.pmxjournal", see journal.py). The journal is removed once the patch
+# is on disk. If a patch is cut off part way through, the journal is still
+# there, and the next patch or read of the file (or recover_msg()) puts those
+# bytes back first, so the file ends up as it was before the interrupted
+# patch.
+
+import csv
+import os
+
+from .duplicates import resolve_duplicates
+from .index import MsgIndex, index_path_for
+from .journal import Journal, journal_path_for, recover_msg, write_journal
+from .records import Message, encode_message, message_chunk_bytes, message_line_names, write_messages
+from .stats import stage
+
+# Reads the changed messages from a CSV or Excel file with an ID column and
+# any of the M1 to M8 columns. Missing lines are left blank.
+def read_message_updates(update_file_path):
+    if update_file_path.lower().endswith(".csv"):
+        with open(update_file_path, 'r', newline='', encoding="utf-8-sig") as file:
+            rows = [row for row in csv.DictReader(file) if (row.get("ID") or "").strip()]
+        return [Message(int(float(row["ID"])), *[row.get(name) or "" for name in message_line_names]) for row in rows]
+
+    import pandas as pd
+
+    df = pd.read_excel(update_file_path)
+    df = df.dropna(subset=['ID'])
+    messages = []
+    for row in df.itertuples(index=False):
+        row = row._asdict()
+        messages.append(Message(int(row["ID"]), *[str(row[name]) if name in row and pd.notna(row[name]) else '' for name in message_line_names]))
+    return messages
+
+# Returns (IDs that were replaced, IDs that were appended). If a message ID
+# is in the update more than once, the last one is used. Every record that
+# uses a replaced ID is overwritten. With stats, finding the records is timed
+# as the "index" stage, and saving the journal and writing the records as the
+# "write" stage.
+def patch_msg(msg_file_path, updates, stats=None):
+    recover_msg(msg_file_path)
+    updates, _ = resolve_duplicates(updates, "last")
+    with stage(stats, "index") as find:
+        index = MsgIndex.open(msg_file_path, save=False)
+        find.records = len(index)
+
+    replaced = []  # (message, offsets of its records)
+    appended = []
+    for message in updates:
+        offsets = index.duplicates.get(message.id) or [index.offset(message.id)]
+        if offsets[0] is None:
+            appended.append(message)
+        else:
+            replaced.append((message, offsets))
+
+    # New messages go after the last whole record
+    end_offset = len(index) * message_chunk_bytes
+    records = [(encode_message(message), offsets) for message, offsets in replaced]
+    journal_file_path = journal_path_for(msg_file_path)
+    with stage(stats, "write", len(updates), len(updates) * message_chunk_bytes), open(msg_file_path, 'r+b') as file:
+        size = os.fstat(file.fileno()).st_size
+        ranges = []
+        for record, offsets in records:
+            for offset in offsets:
+                file.seek(offset)
+                ranges.append((offset, file.read(message_chunk_bytes), record))
+        if appended and end_offset < size:
+            # A partial record at the end is cut off by the new messages
+            file.seek(end_offset)
+            ranges.append((end_offset, file.read(), encode_message(appended[0])))
+        if appended:
+            journal = Journal(size, end_offset, end_offset + len(appended) * message_chunk_bytes, ranges)
+        else:
+            journal = Journal(size, size, size, ranges)
+        write_journal(journal_file_path, journal)
+
+        for record, offsets in records:
+            for offset in offsets:
+                file.seek(offset)
+                file.write(record)
+        if appended:
+            file.seek(end_offset)
+            file.truncate()
+            write_messages(file, appended)
+        file.flush()
+        os.fsync(file.fileno())
+    os.remove(journal_file_path)
+
+    # Keep an existing sidecar index current instead of letting it go stale
+    replaced_ids = [message.id for message, _ in replaced]
+    appended_ids = [message.id for message in appended]
+    if os.path.exists(index_path_for(msg_file_path)):
+        stat = os.stat(msg_file_path)
+        MsgIndex(index.ids + appended_ids, stat.st_size, stat.st_mtime_ns).save(msg_file_path)
+
+    return replaced_ids, appended_ids
@@ -0,0 +1,150 @@
+# romero@engineer.com
+
+# PLU spreadsheet tasks: adding the messages to a PLU file and sorting a PLU
+# file by g-code.
+
+import os
+
+from .stats import stage
+
+# Columns added to a PLU spreadsheet, in the order they follow the ID column
+# of a message spreadsheet
+plu_message_headers = ["M1", "M2", "M3", "M4", "M5", "M6", "M7", "M8", "Merged", "Merged with Spaces", "Merged with Newlines"]
+plu_wrapped_headers = ["Merged", "Merged with Spaces", "Merged with Newlines"]
+
+def plu_messages_path(plu_file_path, msg_file_path):
+    plu_name = os.path.splitext(plu_file_path)[0]
+    msg_file_name_without_extension = os.path.basename(os.path.splitext(msg_file_path)[0])
+    return plu_name + '+' + msg_file_name_without_extension + '.xlsx'
+
+def gsorted_path(plu_file_path):
+    plu_name, plu_extension = os.path.splitext(plu_file_path)
+    return plu_name + " g-sorted" + plu_extension
+
+# Adds the message columns to every PLU row whose MessageNo matches a message
+# ID. PLUs without a message (MessageNo 0) or with an unknown one are left
+# blank. The columns after ID in msg_df fill plu_message_headers in order.
+# When an ID is used more than once, the last message with it is used.
+# Values are added as text, and cells that are empty (or read as "nan") stay
+# empty.
+def merge_plu_messages(plu_df, msg_df):
+    message_columns = list(msg_df.columns[1:len(plu_message_headers) + 1])
+    headers = plu_message_headers[:len(message_columns)]
+
+    messages = msg_df.dropna(subset=['ID']).drop_duplicates(subset='ID', keep='last').set_index('ID')[message_columns]
+    messages.columns = headers
+    for header in headers:
+        text = messages[header].map(str)
+        messages[header] = text.where(text != "nan").astype(object)
+
+    # One lookup for every PLU at once. MessageNo 0 or less matches nothing.
+    message_no = plu_df['MessageNo']
+    matched = messages.reindex(message_no.where(message_no > 0))
+
+    plu_df = plu_df.reindex(columns=[*plu_df.columns, *plu_message_headers])
+    for header in headers:
+        plu_df[header] = matched[header].to_numpy(dtype=object)
+    return plu_df
+
+# The header row style pandas' to_excel() uses
+plu_header_format = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+
+# Rows of df as tuples of plain Python values, with empty cells as None
+def dataframe_rows(df):
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+# Streams df to a one-sheet .xlsx file a row at a time, with constant_memory
+# (see message_workbook()). The columns named in wrapped_headers get text
+# wrapping as their column format, which every cell in them picks up as it is
+# written. header_format styles the header row, which is plain without it.
+# The file is opened first, so a file that is open in Excel fails with
+# PermissionError before any work is done.
+def write_plu_xlsx(df, output_file_path, wrapped_headers=(), header_format=None):
+    import xlsxwriter
+
+    with open(output_file_path, 'wb') as file:
+        workbook = xlsxwriter.Workbook(file, {'constant_memory': True, 'strings_to_urls': False, 'default_date_format': 'yyyy-mm-dd hh:mm:ss'})
+        worksheet = workbook.add_worksheet()
+        text_wrap_format = workbook.add_format({'text_wrap': True})
+        for column, header in enumerate(df.columns):
+            if header in wrapped_headers:
+                worksheet.set_column(column, column, None, text_wrap_format)
+        worksheet.write_row(0, 0, [str(header) for header in df.columns], workbook.add_format(header_format) if header_format else None)
+        for row, values in enumerate(dataframe_rows(df), 1):
+            worksheet.write_row(row, 0, values)
+        workbook.close()
+
+# .xls sheets hold at most this many rows (the header included) and columns
+xls_row_limit = 65536
+xls_column_limit = 256
+
+# Writes df to a one-sheet .xls file with xlwt, with a plain header row.
+# Finished rows are flushed to xlwt's output buffer as it goes instead of
+# being kept as cell objects.
+def write_plu_xls(df, output_file_path, flush_rows=1000):
+    import pandas as pd
+    import xlwt
+
+    if len(df) + 1 > xls_row_limit or len(df.columns) > xls_column_limit:
+        raise ValueError(f"{len(df)} rows and {len(df.columns)} columns do not fit in a .xls sheet "
+                         f"({xls_row_limit - 1} rows and {xls_column_limit} columns at most). Save it as .xlsx instead.")
+
+    workbook = xlwt.Workbook()
+    sheet = workbook.add_sheet("Sheet1")
+    date_style = xlwt.easyxf(num_format_str="yyyy-mm-dd hh:mm:ss")
+    column_styles = [date_style if pd.api.types.is_datetime64_any_dtype(dtype) else xlwt.Style.default_style for dtype in df.dtypes]
+
+    for column, header in enumerate(df.columns):
+        sheet.write(0, column, str(header))
+    for row, values in enumerate(dataframe_rows(df), 1):
+        for column, value in enumerate(values):
+            if value is not None:
+                sheet.write(row, column, value, column_styles[column])
+        if row % flush_rows == 0:
+            sheet.flush_row_data()
+    workbook.save(output_file_path)
+
+# Saves a merged PLU DataFrame with text wrapping on the merged columns, in a
+# single pass
+def save_plu_messages(merged_df, output_file_path, stats=None):
+    with stage(stats, "write", len(merged_df)) as write:
+        write_plu_xlsx(merged_df, output_file_path, plu_wrapped_headers, plu_header_format)
+        write.bytes = os.path.getsize(output_file_path)
+
+def append_messages_to_plu(plu_file_path, msg_file_path, output_file_path=None, stats=None):
+    import pandas as pd
+
+    if output_file_path is None:
+        output_file_path = plu_messages_path(plu_file_path, msg_file_path)
+    with stage(stats, "read") as read:
+        plu_df = pd.read_excel(plu_file_path)
+        msg_df = pd.read_excel(msg_file_path)
+        read.records = len(plu_df) + len(msg_df)
+        read.bytes = os.path.getsize(plu_file_path) + os.path.getsize(msg_file_path)
+    with stage(stats, "merge", len(plu_df)):
+        merged_df = merge_plu_messages(plu_df, msg_df)
+    save_plu_messages(merged_df, output_file_path, stats)
+    return output_file_path
+
+# Sorts by GCode, then by the first column (the PLU number). The sorted rows
+# are streamed out with write_plu_xlsx(), or with write_plu_xls() when
+# output_file_path is a .xls file, under a plain header row.
+def sort_plu_by_gcode(plu_file_path, output_file_path=None, stats=None):
+    import pandas as pd
+
+    if output_file_path is None:
+        output_file_path = gsorted_path(plu_file_path)
+
+    with stage(stats, "read") as read:
+        df = pd.read_excel(plu_file_path)
+        read.records = len(df)
+        read.bytes = os.path.getsize(plu_file_path)
+    with stage(stats, "sort", len(df)):
+        sorted_df = df.sort_values(by=["GCode", df.columns[0]])
+    with stage(stats, "write", len(df)) as write:
+        if os.path.splitext(output_file_path)[1].lower() == ".xls":
+            write_plu_xls(sorted_df, output_file_path)
+        else:
+            write_plu_xlsx(sorted_df, output_file_path)
+        write.bytes = os.path.getsize(output_file_path)
+    return output_file_path
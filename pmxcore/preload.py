@@ -0,0 +1,22 @@
+# romero@engineer.com
+
+# Importing the spreadsheet libraries ahead of time in the background, so the
+# first task that needs them does not have to wait for the import.
+
+import importlib
+import threading
+
+heavy_modules = ("numpy", "pandas", "openpyxl", "xlsxwriter", "xlwt")
+
+def preload_heavy_modules():
+    for name in heavy_modules:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            # Reported by the task that needs it
+            pass
+
+def start_preload():
+    thread = threading.Thread(target=preload_heavy_modules, name="pmx-preload", daemon=True)
+    thread.start()
+    return thread
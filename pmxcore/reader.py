@@ -0,0 +1,99 @@
+# romero@engineer.com
+
+# Random access to the records of a .msg file without loading all of them.
+#
+#   with MsgReader("file.msg") as reader:
+#       count = len(reader)
+#       first = reader[0]
+#       last_ten = reader[-10:]
+#
+# The file is memory-mapped and a record's ID and lines are only decoded when
+# they are first read, so looking at a few messages of a large file costs
+# about the same as looking at a small one. Records have to be read before
+# the reader is closed.
+
+import mmap
+import os
+
+from .journal import recover_msg
+from .records import (
+    Message,
+    decode_message_line,
+    id_struct,
+    message_chunk_bytes,
+    message_line_names,
+    record_struct,
+)
+
+class MessageRecord(Message):
+    # A Message backed by one record of a mapped .msg file. The ID and the
+    # lines become plain attributes the first time they are read.
+    def __init__(self, buffer, offset):
+        self._buffer = buffer
+        self._offset = offset
+
+    def __getattr__(self, name):
+        if name == "id":
+            self.id = id_struct.unpack_from(self._buffer, self._offset)[0]
+            return self.id
+        if name in message_line_names:
+            record = record_struct.unpack_from(self._buffer, self._offset)
+            for line_name, field in zip(message_line_names, record[1:]):
+                setattr(self, line_name, decode_message_line(field))
+            return self.__dict__[name]
+        raise AttributeError(name)
+
+    @property
+    def offset(self):
+        return self._offset
+
+class MsgReader:
+    def __init__(self, path):
+        self.path = path
+        recover_msg(path)
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        # Empty files cannot be mapped
+        if size > 0:
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._buffer = b""
+        self._count = size // message_chunk_bytes
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._record(i) for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("message index out of range")
+        return self._record(index)
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self._record(i)
+
+    # Looks a message up by ID through a MsgIndex of this file. Returns None if
+    # the ID is not in the file.
+    def get(self, message_id, index):
+        offset = index.offset(message_id)
+        if offset is None:
+            return None
+        return MessageRecord(self._buffer, offset)
+
+    def _record(self, index):
+        return MessageRecord(self._buffer, index * message_chunk_bytes)
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,270 @@
+# romero@engineer.com
+
+# The .msg record format shared by pmx.py and pmxUI.py.
+
+# How a message in a .msg file is formatted:
+#  ID  M1      M2      M3      M4      M5      M6      M7      M8
+# [__][___][_][___][_][___][_][___][_][___][_][___][_][___][_][___][_]
+#  4   50   1  50   1  50   1  50   1  50   1  50   1  50   1  50   1
+
+import codecs
+import os
+import struct
+
+from .journal import recover_msg
+from .stats import stage
+
+encoding = "windows-1252"
+encoding_errors = "pmx-windows-1252"
+
+# windows-1252 leaves 129, 141, 143, 144 and 157 unused. Those bytes are read
+# as the control character with the same number, and written back the same
+# way, so they survive a round trip. The same goes for characters 128 - 159
+# in spreadsheets made by older versions, which read every byte with chr().
+# Any other character that windows-1252 has no byte for is written as '?'.
+def windows_1252_errors(error):
+    if isinstance(error, UnicodeDecodeError):
+        return "".join(chr(byte) for byte in error.object[error.start:error.end]), error.end
+    if isinstance(error, UnicodeEncodeError):
+        replacement = bytes(ord(char) if 128 <= ord(char) <= 159 else ord("?") for char in error.object[error.start:error.end])
+        return replacement, error.end
+    raise error
+
+codecs.register_error(encoding_errors, windows_1252_errors)
+
+message_chunk_bytes = 412
+id_bytes = 4
+message_line_bytes = 50
+message_line_count = 8
+
+# Each line is read as its 50 bytes plus the NULL separator after it, so a
+# record unpacks in one call as (ID, M1 .. M8).
+record_struct = struct.Struct("<I" + "51s" * message_line_count)
+id_struct = struct.Struct("<I")
+message_field_bytes = message_line_bytes + 1
+message_line_names = ("M1", "M2", "M3", "M4", "M5", "M6", "M7", "M8")
+
+def empty_check(x):
+    if len(x) > 1:
+        return False
+    elif len(x) == 1 and ord(x) == 0:
+        return True
+    else:
+        return x == "" or len(x) == 0
+
+class Message:
+    def __init__(self, id=0, M1="", M2="", M3="", M4="", M5="", M6="", M7="", M8=""):
+        self.id = id
+        self.M1 = M1
+        self.M2 = M2
+        self.M3 = M3
+        self.M4 = M4
+        self.M5 = M5
+        self.M6 = M6
+        self.M7 = M7
+        self.M8 = M8
+
+    def set_id(self, id):
+        self.id = id
+
+    def set_m1(self, m1):
+        self.M1 = m1
+
+    def set_m2(self, m2):
+        self.M2 = m2
+
+    def set_m3(self, m3):
+        self.M3 = m3
+
+    def set_m4(self, m4):
+        self.M4 = m4
+
+    def set_m5(self, m5):
+        self.M5 = m5
+
+    def set_m6(self, m6):
+        self.M6 = m6
+
+    def set_m7(self, m7):
+        self.M7 = m7
+
+    def set_m8(self, m8):
+        self.M8 = m8
+
+    def valid_message_id(self):
+        return self.id > 0
+
+    def message_empty(self):
+        return self.M1 != "" | self.M2 != "" | self.M3 != "" | self.M4 != "" | self.M5 != "" | self.M6 != "" | self.M7 != "" | self.M8 != ""
+
+    def print(self):
+        print("Message", self.id, ": M1: \"", self.M1,
+              "\"  M2: \"", self.M2,
+              "\"  M3: \"", self.M3,
+              "\"  M4: \"", self.M4,
+              "\"  M5: \"", self.M5,
+              "\"  M6: \"", self.M6,
+              "\"  M7: \"", self.M7,
+              "\"  M8: \"", self.M8)
+
+    def merge_ms(self, separator=""):
+        return f"{self.M1}{separator}{self.M2}{separator}{self.M3}{separator}{self.M4}{separator}{self.M5}{separator}{self.M6}{separator}{self.M7}{separator}{self.M8}"#.replace("\x00", "")
+
+    def merge_ms_optimal(self, separator=""):
+        lines = [self.M1, self.M2, self.M3, self.M4, self.M5, self.M6, self.M7, self.M8]
+        if separator == "" and len(separator) == 0:
+            return "".join(lines).replace("\x00", "")
+        # Remove any hanging blank lines
+        return separator.join(lines[:last_line_count(lines)]).replace("\x00", "")
+
+    # The three merged columns at once: (no separator, spaces, newlines)
+    def merged_columns(self):
+        return merged_columns([self.M1, self.M2, self.M3, self.M4, self.M5, self.M6, self.M7, self.M8])
+
+def get_id_from_bytes(A, B, C, D):
+    return ord(A) + (256 * ord(B)) + (256 * 256 * ord(C)) + (256 * 256 * 256 * ord(D))
+
+def get_id_from_ints(A, B, C, D):
+    return A + (256 * B) + (256 * 256 * C) + (256 * 256 * 256 * D)
+
+# The number of lines left once any hanging blank lines at the end are
+# removed. A blank line is empty or a single NULL character.
+def last_line_count(lines):
+    count = len(lines)
+    while count > 0 and (lines[count - 1] == "" or lines[count - 1] == "\x00"):
+        count -= 1
+    return count
+
+# The "Merged", "Merged with Spaces" and "Merged with Newlines" columns of one
+# message in a single pass. Only the spaced and newline versions drop the
+# hanging blank lines, the same as merge_ms_optimal().
+def merged_columns(lines, count=None):
+    if count is None:
+        count = last_line_count(lines)
+    merged = "".join(lines)
+    spaced = " ".join(lines[:count])
+    newlined = "\n".join(lines[:count])
+    if "\x00" in merged:
+        return merged.replace("\x00", ""), spaced.replace("\x00", ""), newlined.replace("\x00", "")
+    return merged, spaced, newlined
+
+# Batch form for a whole column of messages. Takes rows of eight lines and
+# returns three lists: merged, merged with spaces and merged with newlines.
+def merged_columns_batch(line_rows, counts=None):
+    if counts is None:
+        results = [merged_columns(lines) for lines in line_rows]
+    else:
+        results = [merged_columns(lines, count) for lines, count in zip(line_rows, counts)]
+    if not results:
+        return [], [], []
+    merged, spaced, newlined = zip(*results)
+    return list(merged), list(spaced), list(newlined)
+
+# Lines are cut to 50 characters. Packing into the 51-byte field pads the rest
+# of the line and its separator with NULL bytes.
+def encode_message_line(line):
+    return line[:message_line_bytes].encode(encoding, encoding_errors)
+
+def encode_message(message):
+    return record_struct.pack(message.id, *[encode_message_line(getattr(message, name)) for name in message_line_names])
+
+# Packs each record into a reused buffer and writes batch_records records per
+# write call. IDs must already be in the 1 to 4294967295 range. Returns the
+# number of messages written.
+def write_messages(file, messages, batch_records=4096):
+    buffer = bytearray(batch_records * message_chunk_bytes)
+    offset = 0
+    count = 0
+    for message in messages:
+        record_struct.pack_into(buffer, offset, message.id, *[encode_message_line(getattr(message, name)) for name in message_line_names])
+        offset += message_chunk_bytes
+        count += 1
+        if offset == len(buffer):
+            file.write(buffer)
+            offset = 0
+    if offset:
+        file.write(memoryview(buffer)[:offset])
+    return count
+
+# A message line ends at its first NULL byte and is decoded in one call. The byte in the separator slot
+# only counts when the 50 line bytes before it had no NULL in them.
+def decode_message_line(field):
+    return field.split(b'\x00', 1)[0].decode(encoding, encoding_errors)
+
+def decode_message(record):
+    id, *lines = record_struct.unpack(record)
+    return Message(id, *[decode_message_line(line) for line in lines])
+
+# A trailing partial record keeps only the lines that were read in full, and
+# is padded out to a whole record. Returns None when there are not enough
+# bytes for an ID.
+def complete_partial_record(tail):
+    if len(tail) < id_bytes:
+        return None
+    complete_lines = (len(tail) - id_bytes) // message_field_bytes
+    return bytes(tail[:id_bytes + complete_lines * message_field_bytes]).ljust(message_chunk_bytes, b'\x00')
+
+def decode_partial_message(tail):
+    record = complete_partial_record(tail)
+    return None if record is None else decode_message(record)
+
+def decode_messages(data):
+    data = memoryview(data)
+    full_bytes = len(data) - (len(data) % message_chunk_bytes)
+    messages = [Message(id, *[decode_message_line(line) for line in lines])
+                for id, *lines in record_struct.iter_unpack(data[:full_bytes])]
+
+    # The last message in a file is only kept if it has a valid ID
+    if full_bytes < len(data):
+        message = decode_partial_message(data[full_bytes:])
+        if message is not None and message.valid_message_id():
+            messages.append(message)
+    elif messages and not messages[-1].valid_message_id():
+        messages.pop()
+    return messages
+
+def read_messages(file):
+    return decode_messages(file.read())
+
+# Yields the messages of a .msg file one at a time, reading chunk_records
+# records per read. source is a path or a binary file-like object (pipes and
+# sockets that return short reads are fine). Gives the same messages as
+# read_messages() without holding the whole file in memory. With stats, the
+# reads and the decoding are timed as the "read" and "parse" stages.
+def iter_messages(source, chunk_records=4096, stats=None):
+    if isinstance(source, (str, os.PathLike)):
+        recover_msg(source)
+        with open(source, 'rb') as file:
+            yield from iter_messages(file, chunk_records, stats)
+        return
+
+    chunk_bytes = chunk_records * message_chunk_bytes
+    pending = b""
+    previous = None  # Held back until we know whether it is the last message
+    while True:
+        with stage(stats, "read") as read:
+            data = source.read(chunk_bytes)
+            read.bytes = len(data)
+        if not data:
+            break
+        if pending:
+            data = pending + data
+        full_bytes = len(data) - (len(data) % message_chunk_bytes)
+        pending = data[full_bytes:]
+        with stage(stats, "parse") as parse:
+            chunk = [Message(id, *[decode_message_line(line) for line in lines]) for id, *lines in record_struct.iter_unpack(memoryview(data)[:full_bytes])]
+            parse.records = len(chunk)
+        for message in chunk:
+            if previous is not None:
+                yield previous
+            previous = message
+
+    # The last message in a file is only kept if it has a valid ID
+    if pending:
+        if previous is not None:
+            yield previous
+        message = decode_partial_message(pending)
+        if message is not None and message.valid_message_id():
+            yield message
+    elif previous is not None and previous.valid_message_id():
+        yield previous
@@ -0,0 +1,166 @@
+# romero@engineer.com
+
+# Incremental .msg <-> Excel conversion.
+#
+# A sync keeps a manifest next to its output ("<output>.pmxsync.json") with a
+# hash of every message record, and the size and modification time of both
+# the source it read and the output it wrote. When the source has not changed
+# since the last sync, nothing is read or written. Otherwise the hashes are
+# compared to find the messages that were added, changed or removed:
+#   - .msg to Excel: an .xlsx file cannot be edited in place, and loading and
+#     saving it again costs more than writing it, so the sheet is written
+#     again from the .msg file with the streaming writer, in file order
+#   - Excel to .msg: changed and added messages are patched into the .msg file
+#     in place (see patch_msg()), and only those records are written. When
+#     messages were removed, or most of them changed, the already-encoded
+#     records are written out in one pass instead.
+# The first sync, or a sync after the output was edited or replaced by
+# something else, converts everything and starts a new manifest.
+
+import collections
+import hashlib
+import json
+import os
+
+from .duplicates import duplicate_report_path, resolve_duplicates, write_duplicate_report
+from .excel import export_messages_to_excel
+from .journal import discard_journal
+from .msgops import iter_records
+from .patch import patch_msg, read_message_updates
+from .records import encode_message, iter_messages, message_chunk_bytes
+from .stats import stage
+
+manifest_extension = ".pmxsync.json"
+manifest_version = 2
+
+# repeated_ids has the ID of each message of an Excel source that was left
+# out because another message used its ID, as merge_msg() returns them
+SyncResult = collections.namedtuple("SyncResult", ["added", "changed", "removed", "full_rewrite", "repeated_ids"])
+Manifest = collections.namedtuple("Manifest", ["hashes", "source"])
+
+def manifest_path_for(output_file_path):
+    return str(output_file_path) + manifest_extension
+
+def record_hash(record):
+    return hashlib.blake2b(record, digest_size=8).hexdigest()
+
+# [size, modification time] of a file, as kept in the manifest
+def file_stamp(file_path):
+    stat = os.stat(file_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def load_manifest(output_file_path, direction):
+    try:
+        with open(manifest_path_for(output_file_path), 'r') as file:
+            manifest = json.load(file)
+        output_stamp = file_stamp(output_file_path)
+        if manifest.get("version") != manifest_version or manifest.get("direction") != direction:
+            return None
+        # The output was changed by something other than a sync
+        if manifest.get("output") != output_stamp:
+            return None
+        return Manifest({int(id): record_hash for id, record_hash in manifest["records"].items()}, manifest.get("source"))
+    except (FileNotFoundError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+def save_manifest(output_file_path, direction, hashes, source_file_path):
+    manifest = {
+        "version": manifest_version,
+        "direction": direction,
+        "source": file_stamp(source_file_path),
+        "output": file_stamp(output_file_path),
+        "records": {str(id): record_hash for id, record_hash in hashes.items()}
+    }
+    with open(manifest_path_for(output_file_path), 'w') as file:
+        json.dump(manifest, file)
+
+# Returns (added, changed, removed) IDs between two {ID: hash} manifests
+def diff_hashes(old_hashes, new_hashes):
+    added = [id for id in new_hashes if id not in old_hashes]
+    changed = [id for id, record_hash in new_hashes.items() if id in old_hashes and old_hashes[id] != record_hash]
+    removed = [id for id in old_hashes if id not in new_hashes]
+    return added, changed, removed
+
+# {ID: hash} of the records of a .msg file, or None if an ID is used twice.
+# The records are the ones read_messages() decodes.
+def hash_msg_records(msg_file_path):
+    hashes = {}
+    for id, record in iter_records(msg_file_path):
+        if id in hashes:
+            return None
+        hashes[id] = record_hash(record)
+    return hashes
+
+# With stats, checking the manifest is timed as the "check" stage and hashing
+# the records as the "hash" stage, along with the stages of the conversion
+def sync_msg_to_xlsx(msg_file_path, xlsx_file_path, stats=None):
+    direction = "msg-to-xlsx"
+    with stage(stats, "check"):
+        manifest = load_manifest(xlsx_file_path, direction)
+        if manifest is not None and manifest.source == file_stamp(msg_file_path):
+            return SyncResult([], [], [], False, [])
+
+    with stage(stats, "hash") as hashing:
+        new_hashes = hash_msg_records(msg_file_path)
+        hashing.bytes = os.path.getsize(msg_file_path)
+        hashing.records = len(new_hashes or ())
+    if new_hashes is not None and manifest is not None:
+        added, changed, removed = diff_hashes(manifest.hashes, new_hashes)
+        if added or changed or removed:
+            export_messages_to_excel(iter_messages(msg_file_path, stats=stats), xlsx_file_path, stats=stats)
+        save_manifest(xlsx_file_path, direction, new_hashes, msg_file_path)
+        return SyncResult(added, changed, removed, False, [])
+
+    # Duplicate IDs cannot be matched to rows, so those files are always
+    # converted in full and get no manifest
+    export_messages_to_excel(iter_messages(msg_file_path, stats=stats), xlsx_file_path, stats=stats)
+    if new_hashes is None:
+        return SyncResult([id for id, _ in iter_records(msg_file_path)], [], [], True, [])
+    save_manifest(xlsx_file_path, direction, new_hashes, msg_file_path)
+    return SyncResult(list(new_hashes), [], [], True, [])
+
+# Reused IDs are handled by duplicate_policy as in xlsx_to_msg(), and the
+# "report" policy saves the messages left out next to the output. With stats,
+# the "check", "read", "duplicates", "encode" and "write" stages are timed (a
+# patch adds its "index" stage).
+def sync_xlsx_to_msg(xlsx_file_path, msg_file_path, duplicate_policy="first", stats=None):
+    direction = "xlsx-to-msg"
+    with stage(stats, "check"):
+        manifest = load_manifest(msg_file_path, direction)
+        if manifest is not None and manifest.source == file_stamp(xlsx_file_path):
+            return SyncResult([], [], [], False, [])
+
+    with stage(stats, "read") as read:
+        updates = read_message_updates(xlsx_file_path)
+        read.records = len(updates)
+        read.bytes = os.path.getsize(xlsx_file_path)
+    with stage(stats, "duplicates", len(updates)):
+        messages, repeated = resolve_duplicates(updates, duplicate_policy)
+    repeated_ids = [message.id for message in repeated]
+    with stage(stats, "encode", len(messages)):
+        records = {message.id: encode_message(message) for message in messages}
+        new_hashes = {id: record_hash(record) for id, record in records.items()}
+
+    if repeated and duplicate_policy == "report":
+        write_duplicate_report(duplicate_report_path(msg_file_path), repeated)
+
+    if manifest is None:
+        write_msg_records(msg_file_path, records, stats)
+        save_manifest(msg_file_path, direction, new_hashes, xlsx_file_path)
+        return SyncResult(list(records), [], [], True, repeated_ids)
+
+    added, changed, removed = diff_hashes(manifest.hashes, new_hashes)
+    if removed or len(added) + len(changed) > len(records) // 2:
+        write_msg_records(msg_file_path, records, stats)
+    elif added or changed:
+        messages_by_id = {message.id: message for message in messages}
+        patch_msg(msg_file_path, [messages_by_id[id] for id in changed + added], stats)
+
+    save_manifest(msg_file_path, direction, new_hashes, xlsx_file_path)
+    return SyncResult(added, changed, removed, False, repeated_ids)
+
+# Writes the encoded records, in order, in one pass
+def write_msg_records(msg_file_path, records, stats=None):
+    discard_journal(msg_file_path)
+    with stage(stats, "write", len(records), len(records) * message_chunk_bytes), open(msg_file_path, 'wb') as file:
+        file.write(b"".join(records.values()))
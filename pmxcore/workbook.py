@@ -0,0 +1,56 @@
+# romero@engineer.com
+
+# Copying spreadsheets between the older .xls and the newer .xlsx format.
+# Every sheet is copied. The original file is never changed.
+
+import os
+
+from .stats import stage
+
+def xls_to_xlsx(xls_file_path, xlsx_file_path=None, stats=None):
+    import pandas as pd
+
+    if xlsx_file_path is None:
+        xlsx_file_path = os.path.splitext(xls_file_path)[0] + ".xlsx"
+    with stage(stats, "read") as read:
+        df = pd.read_excel(xls_file_path, sheet_name=None)
+        read.records = sum(len(data) for data in df.values())
+        read.bytes = os.path.getsize(xls_file_path)
+    with stage(stats, "write", read.records):
+        with pd.ExcelWriter(xlsx_file_path, engine='xlsxwriter') as writer:
+            for sheet_name, data in df.items():
+                data.to_excel(writer, sheet_name=sheet_name, index=False)
+    return xlsx_file_path
+
+# Many formulas do not work in .xls files
+def xlsx_to_xls(xlsx_file_path, xls_file_path=None, stats=None):
+    import openpyxl
+    import xlwt
+
+    if xls_file_path is None:
+        xls_file_path = os.path.splitext(xlsx_file_path)[0] + ".xls"
+    with stage(stats, "read") as read:
+        workbook_xlsx = openpyxl.load_workbook(xlsx_file_path)
+        read.bytes = os.path.getsize(xlsx_file_path)
+    workbook_xls = xlwt.Workbook()
+    with stage(stats, "copy") as copy:
+        for sheet_name in workbook_xlsx.sheetnames:
+            sheet_xlsx = workbook_xlsx[sheet_name]
+            sheet_xls = workbook_xls.add_sheet(sheet_name)
+            for row_idx, row in enumerate(sheet_xlsx.iter_rows(min_row=1, values_only=True), start=1):
+                for col_idx, value in enumerate(row, start=1):
+                    sheet_xls.write(row_idx - 1, col_idx - 1, value)
+                copy.records += 1
+    with stage(stats, "write", copy.records):
+        workbook_xls.save(xls_file_path)
+    return xls_file_path
+
+# Converts a .xls file to .xlsx or a .xlsx file to .xls, going by the
+# extension of source_file_path. Returns the path of the new file.
+def convert_xls(source_file_path, output_file_path=None, stats=None):
+    extension = os.path.splitext(source_file_path)[1].lower()
+    if extension == ".xls":
+        return xls_to_xlsx(source_file_path, output_file_path, stats)
+    if extension == ".xlsx":
+        return xlsx_to_xls(source_file_path, output_file_path, stats)
+    raise ValueError(f"'{source_file_path}' is not a .xls or .xlsx file")
@@ -0,0 +1,41 @@
+# romero@engineer.com
+
+# msg_to_xlsx() has to decide whether a file is sorted from the same records
+# read_messages() keeps, or a "sorted" export can hold unsorted messages.
+# Run from the repository root with: python -m pytest tests
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pmxcore.convert import msg_to_xlsx
+from pmxcore.records import record_struct
+
+openpyxl = pytest.importorskip("openpyxl")
+pytest.importorskip("xlsxwriter")
+
+def make_record(id, text):
+    return record_struct.pack(id, text.encode(), *[b""] * 7)
+
+def export_sorted(data, tmp_path):
+    msg_file_path = tmp_path / "messages.msg"
+    msg_file_path.write_bytes(data)
+    export = msg_to_xlsx(str(msg_file_path), sort_output="sorted")
+    sheet = openpyxl.load_workbook(export.written[0], read_only=True).active
+    ids = [row[0] for row in sheet.iter_rows(min_row=2, values_only=True)]
+    return export, ids
+
+def test_truncated_last_record_counts_toward_order(tmp_path):
+    data = make_record(1, "one") + make_record(2, "two") + make_record(3, "three") + make_record(1, "again")[:100]
+    export, ids = export_sorted(data, tmp_path)
+    assert (export.is_sorted, export.duplicate_ids) == (False, [1])
+    assert ids == [1, 1, 2, 3]
+
+def test_trailing_zero_id_record_does_not_count(tmp_path):
+    data = make_record(1, "one") + make_record(2, "two") + make_record(0, "")
+    export, ids = export_sorted(data, tmp_path)
+    assert (export.is_sorted, export.duplicate_ids) == (True, [])
+    assert ids == [1, 2]
@@ -0,0 +1,64 @@
+# romero@engineer.com
+
+# The undo journal of patch_msg() has to put back a patch that was cut off,
+# and must never be applied to a file that was written again since. Run from
+# the repository root with: python -m pytest tests
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pmxcore.patch
+from pmxcore.convert import read_msg, write_msg
+from pmxcore.journal import journal_path_for
+from pmxcore.patch import patch_msg
+from pmxcore.records import Message
+
+def contents(msg_file_path):
+    return [(message.id, message.M1) for message in read_msg(msg_file_path)]
+
+# Runs a patch that is cut off after the changed records are written, while
+# it adds the new ones
+def interrupted_patch(msg_file_path, updates, monkeypatch):
+    def cut_off(file, messages):
+        raise KeyboardInterrupt
+    with monkeypatch.context() as patch:
+        patch.setattr(pmxcore.patch, "write_messages", cut_off)
+        with pytest.raises(KeyboardInterrupt):
+            patch_msg(msg_file_path, updates)
+    assert os.path.exists(journal_path_for(msg_file_path))
+
+@pytest.fixture
+def msg_file_path(tmp_path):
+    msg_file_path = str(tmp_path / "j.msg")
+    write_msg(msg_file_path, [Message(1, "old1"), Message(2, "old2")])
+    return msg_file_path
+
+def test_interrupted_patch_is_undone_before_a_read(msg_file_path, monkeypatch):
+    interrupted_patch(msg_file_path, [Message(1, "new1"), Message(3, "new3")], monkeypatch)
+    assert contents(msg_file_path) == [(1, "old1"), (2, "old2")]
+    assert not os.path.exists(journal_path_for(msg_file_path))
+
+def test_interrupted_patch_is_undone_before_the_next_patch(msg_file_path, monkeypatch):
+    interrupted_patch(msg_file_path, [Message(1, "new1"), Message(3, "new3")], monkeypatch)
+    patch_msg(msg_file_path, [Message(2, "new2")])
+    assert contents(msg_file_path) == [(1, "old1"), (2, "new2")]
+
+def test_rewritten_file_drops_the_journal(msg_file_path, monkeypatch):
+    interrupted_patch(msg_file_path, [Message(1, "new1"), Message(3, "new3")], monkeypatch)
+    write_msg(msg_file_path, [Message(1, "new1"), Message(2, "new2"), Message(3, "new3"), Message(4, "new4")])
+    assert not os.path.exists(journal_path_for(msg_file_path))
+    patch_msg(msg_file_path, [Message(4, "patched")])
+    assert contents(msg_file_path) == [(1, "new1"), (2, "new2"), (3, "new3"), (4, "patched")]
+
+def test_journal_of_another_file_is_not_applied(msg_file_path, monkeypatch):
+    interrupted_patch(msg_file_path, [Message(1, "new1"), Message(3, "new3")], monkeypatch)
+    # Written by something that does not know about the journal
+    with open(msg_file_path, 'wb') as file:
+        pmxcore.records.write_messages(file, [Message(1, "other1"), Message(2, "new2"), Message(3, "new3"), Message(4, "new4")])
+    patch_msg(msg_file_path, [Message(4, "patched")])
+    assert contents(msg_file_path) == [(1, "other1"), (2, "new2"), (3, "new3"), (4, "patched")]
+    assert not os.path.exists(journal_path_for(msg_file_path))
@@ -0,0 +1,23 @@
+# romero@engineer.com
+
+# sync_xlsx_to_msg() has to handle reused IDs the way xlsx_to_msg() does.
+# Run from the repository root with: python -m pytest tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pmxcore.convert import read_msg
+from pmxcore.duplicates import duplicate_report_path
+from pmxcore.sync import sync_xlsx_to_msg
+
+def test_report_policy_saves_the_messages_left_out(tmp_path):
+    source_file_path = tmp_path / "m.csv"
+    source_file_path.write_text("ID,M1\n1,one\n2,two\n1,again\n2,twice\n2,thrice\n", encoding="utf-8")
+    msg_file_path = str(tmp_path / "y.msg")
+    result = sync_xlsx_to_msg(str(source_file_path), msg_file_path, "report")
+    assert result.repeated_ids == [1, 2, 2]
+    assert [(message.id, message.M1) for message in read_msg(msg_file_path)] == [(1, "one"), (2, "two")]
+    with open(duplicate_report_path(msg_file_path), encoding="utf-8-sig") as file:
+        assert [line.split(",")[:2] for line in file.read().splitlines()[1:]] == [["1", "again"], ["2", "twice"], ["2", "thrice"]]
@@ -0,0 +1,38 @@
+# romero@engineer.com
+
+# MessageTable has to load a .msg file the way read_messages() does, or the
+# sorted copy made by msg_to_xlsx() holds different messages from the sheet
+# in file order. Run from the repository root with: python -m pytest tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pmxcore.convert import messages_sorted_by_id
+from pmxcore.records import decode_messages, record_struct
+from pmxcore.table import MessageTable
+
+def make_record(id, text):
+    return record_struct.pack(id, text.encode(), *[b""] * 7)
+
+def sorted_ids(data, tmp_path):
+    msg_file_path = tmp_path / "messages.msg"
+    msg_file_path.write_bytes(data)
+    return [message.id for message in messages_sorted_by_id(str(msg_file_path))]
+
+def test_truncated_last_record_is_kept(tmp_path):
+    data = make_record(5, "five") + make_record(3, "three") + make_record(9, "nine") + make_record(7, "seven")[:100]
+    assert [message.id for message in decode_messages(data)] == [5, 3, 9, 7]
+    assert sorted_ids(data, tmp_path) == [3, 5, 7, 9]
+    assert MessageTable.from_bytes(data).to_messages()[-1].M1 == "seven"
+
+def test_trailing_zero_id_record_is_dropped(tmp_path):
+    data = make_record(5, "five") + make_record(3, "three") + make_record(9, "nine") + make_record(0, "")
+    assert [message.id for message in decode_messages(data)] == [5, 3, 9]
+    assert sorted_ids(data, tmp_path) == [3, 5, 9]
+
+def test_partial_record_without_valid_id_is_dropped(tmp_path):
+    data = make_record(5, "five") + make_record(0, "zero")[:60]
+    assert sorted_ids(data, tmp_path) == [5]
+    assert sorted_ids(data[:412 + 2], tmp_path) == [5]